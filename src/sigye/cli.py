@@ -7,7 +7,7 @@ import cappa
 
 from .config.settings import DEFAULT_CONFIG_PATH, Settings
 from .editors import EditorError
-from .models import EntryListFilter
+from .models import GROUP_BY_CHOICES, EntryListFilter
 from .output import OutputFormatter, OutputType, create_output_formatter
 from .output.output_utils import validate_output_format
 from .services import TimeTrackingService
@@ -86,11 +86,7 @@ class Stop:
 
     def __call__(self, context: Context) -> None:
         try:
-            if self.comment:
-                time_entry = context.tts.get_active_entry()
-                time_entry.comment = self.comment
-                time_entry = context.tts.update_entry(time_entry)
-            time_entry = context.tts.stop_tracking(stop_time=self.stop_time)
+            time_entry = context.tts.stop_tracking(stop_time=self.stop_time, comment=self.comment)
         except ValueError as e:
             raise cappa.Exit(str(e), code=1) from e
         context.output.single_entry_output(time_entry)
@@ -144,7 +140,8 @@ class List:
     """display list of time entries for a time period
 
     Default behavior (no time_period): shows today's entries, plus any active entry from a previous date.
-    Use 'all' to display all time entries.
+    Use 'all' to display all time entries. With --limit, --last, --offset or --after and no time period or
+    dates, all entries are paged through.
     """
 
     time_period: Annotated[str, cappa.Arg(choices=["today", "yesterday", "week", "month", "all", ""])] = ""
@@ -168,6 +165,66 @@ class List:
     ] = None
     tag: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
     project: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
+    limit: Annotated[int | None, cappa.Arg(long=True, help="Show only the first LIMIT entries")] = None
+    last: Annotated[int | None, cappa.Arg(long=True, help="Show only the most recent LAST entries")] = None
+    offset: Annotated[int, cappa.Arg(long=True, help="Skip OFFSET entries (from the end with --last)")] = 0
+    after: Annotated[str, cappa.Arg(long=True, help="Continue after the entry with this (partial) id")] = ""
+
+    def __call__(self, context: Context) -> None:
+        try:
+            filter = EntryListFilter(
+                time_period=self.time_period,
+                start_date=self.start_date,
+                end_date=self.end_date,
+                tags=set(self.tag),
+                projects=set(self.project),
+                limit=self.limit,
+                last=self.last,
+                offset=self.offset,
+                after=self.after,
+            )
+        except ValueError as e:
+            raise cappa.Exit(str(e), code=1) from e
+        try:
+            time_list = context.tts.list_records(filter=filter)
+        except KeyError as e:
+            raise cappa.Exit(f"No entry found with id {self.after}", code=1) from e
+        except IndexError as e:
+            raise cappa.Exit(f"Multiple records found starting with id {self.after}", code=1) from e
+        context.output.multiple_entries_output(time_list)
+
+
+@cappa.command(name="search", help="find time entries by the words in their comments")
+@dataclass
+class Search:
+    """find time entries by the words in their comments
+
+    Every word has to appear in the comment; end a word with * to match words starting with it. Searches
+    all entries unless a time period, dates, tags or projects narrow it down.
+    """
+
+    query: str
+    time_period: Annotated[str, cappa.Arg(choices=["today", "yesterday", "week", "month", "all"])] = "all"
+    start_date: Annotated[
+        date | None,
+        cappa.Arg(
+            long="--start_date",
+            parse=_parse_date,
+            parse_inference=False,
+            help="Start date in format YYYY-MM-DD",
+        ),
+    ] = None
+    end_date: Annotated[
+        date | None,
+        cappa.Arg(
+            long="--end_date",
+            parse=_parse_date,
+            parse_inference=False,
+            help="End date in format YYYY-MM-DD",
+        ),
+    ] = None
+    tag: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
+    project: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
 
     def __call__(self, context: Context) -> None:
         filter = EntryListFilter(
@@ -177,8 +234,67 @@ class List:
             tags=set(self.tag),
             projects=set(self.project),
         )
-        time_list = context.tts.list_entries(filter=filter)
-        context.output.multiple_entries_output(time_list)
+        context.output.multiple_entries_output(context.tts.search_entries(self.query, filter=filter))
+
+
+@cappa.command(name="report", help="total time per day, week, month, project, project prefix or tag")
+@dataclass
+class Report:
+    """total time per day, week, month, project, project prefix or tag
+
+    Give --by several times to group by a combination, e.g. --by week --by project. The project prefix is
+    the project name up to its first "-". The active entry counts up to now. Reports all entries unless a
+    time period, dates, tags or projects narrow it down.
+    """
+
+    time_period: Annotated[str, cappa.Arg(choices=["today", "yesterday", "week", "month", "all"])] = "all"
+    by: Annotated[list[str], cappa.Arg(long=True, choices=list(GROUP_BY_CHOICES), help="Group by (repeatable)")] = (
+        field(default_factory=lambda: ["project"])
+    )
+    start_date: Annotated[
+        date | None,
+        cappa.Arg(
+            long="--start_date",
+            parse=_parse_date,
+            parse_inference=False,
+            help="Start date in format YYYY-MM-DD",
+        ),
+    ] = None
+    end_date: Annotated[
+        date | None,
+        cappa.Arg(
+            long="--end_date",
+            parse=_parse_date,
+            parse_inference=False,
+            help="End date in format YYYY-MM-DD",
+        ),
+    ] = None
+    tag: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
+    project: Annotated[list[str], cappa.Arg(long=True)] = field(default_factory=list)
+
+    def __call__(self, context: Context) -> None:
+        filter = EntryListFilter(
+            time_period=self.time_period,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            tags=set(self.tag),
+            projects=set(self.project),
+        )
+        group_by = list(dict.fromkeys(self.by))  # a grouping given twice would only repeat its column
+        context.output.report_output(context.tts.report(group_by, filter=filter), group_by)
+
+
+@cappa.command(name="rebuild-rollups", help="recompute the daily totals reports read")
+@dataclass
+class RebuildRollups:
+    """recompute the daily totals reports read
+
+    Reports keep per-day totals that are updated as entries change. This recomputes them from the entries
+    and lists the days whose kept totals were out of date.
+    """
+
+    def __call__(self, context: Context) -> None:
+        context.output.rollup_output(context.tts.rebuild_rollups())
 
 
 @cappa.command(name="export", help="export time entries to a file")
@@ -214,7 +330,9 @@ class Sigye:
             help="Output format",
         ),
     ] = None
-    cmd: cappa.Subcommands[Start | Stop | Status | Edit | Delete | List | Export] = None
+    cmd: cappa.Subcommands[Start | Stop | Status | Edit | Delete | List | Search | Report | RebuildRollups | Export] = (
+        None
+    )
 
 
 def cli(argv: list[str] | None = None) -> None:
@@ -22,6 +22,21 @@ class AutoTagRule(BaseModel):
     tags: list[str]
 
 
+class SqliteSettings(BaseModel):
+    """PRAGMAs applied whenever a SQLite (.db) data file is opened"""
+
+    journal_mode: Literal["wal", "delete", "truncate", "persist", "memory", "off"] = (
+        "wal"  # readers don't block the writer
+    )
+    synchronous: Literal["off", "normal", "full", "extra"] = "normal"  # with WAL, only the last commits are at risk
+    mmap_size: int = 256 * 1024 * 1024  # bytes of the file read through memory mapping
+    cache_size: int = -16_000  # negative: page cache size in KiB
+    temp_store: Literal["default", "file", "memory"] = "memory"
+
+    def pragmas(self) -> dict[str, str | int]:
+        return self.model_dump()
+
+
 class Settings(BaseSettings):
     data_filename: Path = Field(default=str(DEFAULT_DATA_FILENAME))
     locale: str = Field(default="en_US")
@@ -29,6 +44,9 @@ class Settings(BaseSettings):
     editor: str = Field(default=DEFAULT_EDITOR)  # really the editor command in the shell
     editor_format: str = Field(default="yaml")  # the format of the editor file
     output_format: OutputType = Field(default=OutputType.EMPTY)
+    storage_layout: Literal["file", "monthly"] = Field(default="file")  # monthly: one file per month
+    fsync_writes: bool = Field(default=False)  # flush text file writes to disk before returning
+    sqlite: SqliteSettings = Field(default_factory=SqliteSettings)
 
     @classmethod
     def load_from_file(cls, path: Path = DEFAULT_CONFIG_PATH) -> Self:
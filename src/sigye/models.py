@@ -1,11 +1,32 @@
-from datetime import date, datetime, timedelta
-from typing import Literal, Self
+import sys
+import time
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, timedelta, timezone
+from typing import Literal, NamedTuple, Self, get_args
 from uuid import uuid4
 
 import humanize
 import humanize.i18n
 from pydantic import BaseModel, Field, model_validator
 
+PROJECT_WILDCARDS = "*+."  # a filter project ending in one of these matches every project starting with the rest
+
+
+_object_setattr = object.__setattr__  # BaseModel.__setattr__ would validate assignments
+
+
+def _stored_datetime(value: datetime | str) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _humanize_duration(td: timedelta) -> str:
+    return humanize.precisedelta(
+        td,
+        suppress=("seconds", "milliseconds", "microseconds"),
+        minimum_unit="hours",
+        format="%0.1f",
+    )
+
 
 class TimeEntry(BaseModel):
     id: str = Field(default_factory=lambda: uuid4().hex)
@@ -21,16 +42,49 @@ class TimeEntry(BaseModel):
             raise ValueError("end time is before start time")
         return self
 
+    @classmethod
+    def from_storage(
+        cls,
+        id: str,
+        start_time: datetime | str,
+        project: str,
+        end_time: datetime | str | None = None,
+        tags: Iterable[str] = (),
+        comment: str = "",
+        **_: object,
+    ) -> Self:
+        """TimeEntry from data a repository stored itself, without validating it again
+
+        Entries were validated before they were saved, so loads only parse the timestamps. Keys this
+        version doesn't know (from another version or a manual edit) are dropped, as validation would.
+        Anything that didn't come from our own storage (editor input, imports) must go through the normal
+        constructor.
+        This fills in the instance the way ``model_construct`` does, minus its per-field default handling,
+        which costs more than validating.
+        """
+        entry = cls.__new__(cls)
+        _object_setattr(
+            entry,
+            "__dict__",
+            {
+                "id": id,
+                "start_time": _stored_datetime(start_time),
+                "end_time": _stored_datetime(end_time) if end_time is not None else None,
+                "project": project,
+                "tags": set(tags),
+                "comment": comment,
+            },
+        )
+        _object_setattr(entry, "__pydantic_fields_set__", set(_TIME_ENTRY_FIELDS))
+        _object_setattr(entry, "__pydantic_extra__", None)
+        _object_setattr(entry, "__pydantic_private__", None)
+        return entry
+
     @property
     def humanized_duration(self):
         td = self.end_time - self.start_time if self.end_time else datetime.now().astimezone() - self.start_time
 
-        return humanize.precisedelta(
-            td,
-            suppress=("seconds", "milliseconds", "microseconds"),
-            minimum_unit="hours",
-            format="%0.1f",
-        )
+        return _humanize_duration(td)
 
     @staticmethod
     def _get_naive_time(ts: datetime) -> datetime | None:
@@ -57,6 +111,118 @@ class TimeEntry(BaseModel):
         return self.end_time - self.start_time if self.end_time else datetime.now().astimezone() - self.start_time
 
 
+_TIME_ENTRY_FIELDS = frozenset(TimeEntry.model_fields)
+
+# shared by every EntryRecord with the same UTC offset or the same tags
+_TIMEZONES: dict[timedelta, timezone] = {timedelta(0): UTC}
+_TAG_SETS: dict[frozenset[str], frozenset[str]] = {}
+
+
+def _epoch_seconds(value: datetime | str) -> tuple[float, timezone | None]:
+    """Epoch seconds and shared timezone of a stored time; naive times are kept as if they were UTC"""
+    value = _stored_datetime(value)
+    if (offset := value.utcoffset()) is None:
+        return value.replace(tzinfo=UTC).timestamp(), None
+    if (tz := _TIMEZONES.get(offset)) is None:
+        tz = _TIMEZONES[offset] = timezone(offset)
+    return value.timestamp(), tz
+
+
+def _shared_tags(tags: Iterable[str]) -> frozenset[str]:
+    key = frozenset(tags)
+    if (shared := _TAG_SETS.get(key)) is None:
+        shared = _TAG_SETS[key] = frozenset(map(sys.intern, key))
+    return shared
+
+
+class EntryRecord(NamedTuple):
+    """Compact, read-only entry for analytical paths such as reports, exports and output
+
+    Times are epoch seconds with a timezone shared by all records with the same offset, projects are
+    interned and equal tag sets are one shared frozenset. Records offer the read-only attributes the
+    output formatters use; ``to_entry`` gives a TimeEntry to edit and save.
+    """
+
+    id: str
+    start: float  # epoch seconds
+    end: float | None
+    tz: timezone | None  # None for naive times
+    project: str
+    tags: frozenset[str]
+    comment: str
+
+    model_fields_set = _TIME_ENTRY_FIELDS  # as for a TimeEntry loaded from storage
+
+    @classmethod
+    def from_storage(
+        cls,
+        id: str,
+        start_time: datetime | str,
+        project: str,
+        end_time: datetime | str | None = None,
+        tags: Iterable[str] = (),
+        comment: str = "",
+        **_: object,
+    ) -> Self:
+        """Record from data a repository stored itself, like ``TimeEntry.from_storage``"""
+        start, tz = _epoch_seconds(start_time)
+        end = _epoch_seconds(end_time)[0] if end_time is not None else None
+        return cls(id, start, end, tz, sys.intern(project), _shared_tags(tags), comment)
+
+    @classmethod
+    def from_entry(cls, entry: TimeEntry) -> Self:
+        return cls.from_storage(entry.id, entry.start_time, entry.project, entry.end_time, entry.tags, entry.comment)
+
+    def to_entry(self) -> TimeEntry:
+        return TimeEntry.from_storage(
+            id=self.id,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            project=self.project,
+            tags=self.tags,
+            comment=self.comment,
+        )
+
+    def model_dump(self, **kwargs) -> dict:
+        return self.to_entry().model_dump(**kwargs)
+
+    def _datetime(self, seconds: float | None) -> datetime | None:
+        if seconds is None:
+            return None
+        if self.tz is None:
+            return datetime.fromtimestamp(seconds, UTC).replace(tzinfo=None)
+        return datetime.fromtimestamp(seconds, self.tz)
+
+    @property
+    def start_time(self) -> datetime:
+        return self._datetime(self.start)
+
+    @property
+    def end_time(self) -> datetime | None:
+        return self._datetime(self.end)
+
+    @property
+    def naive_start_time(self) -> datetime:
+        return self.start_time.replace(tzinfo=None)
+
+    @property
+    def naive_end_time(self) -> datetime | None:
+        return self.end_time.replace(tzinfo=None) if self.end is not None else None
+
+    @property
+    def seconds(self) -> float:
+        """Duration in seconds, up to now for a running entry"""
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    @property
+    def duration(self) -> timedelta:
+        return timedelta(seconds=self.seconds)
+
+    @property
+    def humanized_duration(self) -> str:
+        return _humanize_duration(self.duration)
+
+
 class EntryListFilter(BaseModel):
     id: str = ""
     projects: set[str] = Field(default_factory=set)
@@ -64,6 +230,11 @@ class EntryListFilter(BaseModel):
     end_date: date | None = None
     tags: set[str] = Field(default_factory=set)
     time_period: Literal["today", "yesterday", "week", "month", "all", ""] | None = None
+    # paging of filter/iter_filter results, applied after the other filters to entries ordered by start time
+    after: str = ""  # id of the entry to continue after
+    offset: int = Field(default=0, ge=0)
+    limit: int | None = Field(default=None, ge=0)  # the first entries (after skipping offset)
+    last: int | None = Field(default=None, ge=0)  # the most recent entries (after skipping offset from the end)
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -84,3 +255,48 @@ class EntryListFilter(BaseModel):
             self.start_date = now.date() - timedelta(days=now.date().weekday())  # Monday
         elif self.time_period == "month":
             self.start_date = now.date() - timedelta(days=(now.date().day - 1))  # 1st of current month
+
+    @property
+    def paged(self) -> bool:
+        return bool(self.after or self.offset) or self.limit is not None or self.last is not None
+
+    def page(self, entries: list) -> list:
+        """Apply offset and limit/last to entries already ordered and continuing after ``after``"""
+        if self.last is not None:
+            end = len(entries) - self.offset
+            return entries[max(0, end - self.last) : max(0, end)]
+        end = None if self.limit is None else self.offset + self.limit
+        return entries[self.offset : end]
+
+
+GroupBy = Literal["day", "week", "month", "project", "project-prefix", "tag"]
+GROUP_BY_CHOICES: tuple[GroupBy, ...] = get_args(GroupBy)
+PROJECT_PREFIX_SEPARATOR = "-"  # "abc-1234" belongs to the project prefix "abc"
+
+
+def project_prefix(project: str) -> str:
+    return project.partition(PROJECT_PREFIX_SEPARATOR)[0]
+
+
+class EntryTotal(NamedTuple):
+    """Total time of the entries sharing a group key
+
+    The key holds one value per grouping: the local start date for day, the Monday starting the week for
+    week, YYYY-MM for month, the project name, the project name up to its first "-" for project-prefix,
+    or a tag ("" for untagged entries; an entry with several tags counts towards each of them).
+    """
+
+    key: tuple[str, ...]
+    duration: timedelta
+    count: int
+
+
+class RollupRebuild(NamedTuple):
+    """Outcome of recomputing the daily rollups from the entries
+
+    ``outdated`` lists the days whose kept rollups disagreed with their entries (none when no rollups
+    were kept yet).
+    """
+
+    days: int
+    outdated: list[str]
@@ -1,9 +1,10 @@
 import csv
 import sys
+from collections.abc import Sequence
 from typing import Any
 
-from ..models import TimeEntry
-from .output import OutputFormatter
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from .output import OutputFormatter, report_rows
 
 
 class CsvOutput(OutputFormatter):
@@ -41,3 +42,10 @@ class CsvOutput(OutputFormatter):
 
     def export_output(self, count: int, filename: str) -> None:
         self._send_output([["exported", "filename"], [count, filename]])
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        header = [*group_by, "duration", "seconds", "count"]
+        self._send_output([header] + [list(row.values()) for row in report_rows(totals, group_by)])
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        self._send_output([["days", "outdated"], [rebuild.days, "|".join(rebuild.outdated)]])
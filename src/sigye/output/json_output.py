@@ -1,8 +1,9 @@
 import json
+from collections.abc import Sequence
 from pathlib import Path
 
-from ..models import TimeEntry
-from .output import OutputFormatter
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from .output import OutputFormatter, report_rows
 
 
 class JsonOutput(OutputFormatter):
@@ -16,3 +17,9 @@ class JsonOutput(OutputFormatter):
 
     def export_output(self, count: int, filename: Path | str) -> None:
         print(json.dumps({"count": count, "filename": str(filename)}))
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        print(json.dumps(report_rows(totals, group_by)))
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        print(json.dumps(rebuild._asdict()))
@@ -1,12 +1,13 @@
+from collections.abc import Sequence
 from datetime import timedelta
 from pathlib import Path
 
 from jinja2 import Template
 from pydantic import BaseModel
 
-from ..models import TimeEntry
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
 from ..utils.datetime_utils import format_delta
-from .output import OutputFormatter
+from .output import REPORT_LABELS, OutputFormatter, report_total
 
 SINGLE_ENTRY = Template(
     """
@@ -37,6 +38,18 @@ MULTIPLE_ENTRIES = Template(
 )
 
 
+REPORT = Template(
+    """
+# Time Report
+
+|{% for label in labels %} {{ label }} |{% endfor %} Delta | Entries |
+|{% for label in labels %}----|{% endfor %}------:|--------:|
+{% for total in totals %}|{% for value in total.key %} {{ value }} |{% endfor %} {{ format_delta(total.duration) }} | {{ total.count }} |
+{% endfor %}{% if grand_total %}| **total** |{% for label in labels[1:] %} |{% endfor %} **{{ format_delta(grand_total.duration) }}** | **{{ grand_total.count }}** |
+{% endif %}"""  # noqa: E501
+)
+
+
 EXPORT_OUTPUT = Template(
     """
 Exported {{ count }} entries to {{ filename }}
@@ -44,6 +57,15 @@ Exported {{ count }} entries to {{ filename }}
 )
 
 
+ROLLUP_OUTPUT = Template(
+    """
+Rebuilt rollups for {{ rebuild.days }} days, {{ rebuild.outdated | length }} out of date
+{% for day in rebuild.outdated %}
+* {{ day }}{% endfor %}
+"""
+)
+
+
 class OutputModel(BaseModel):
     total_description: str = ""
     total_duration: str = ""
@@ -82,3 +104,11 @@ class MarkdownOutput(OutputFormatter):
 
     def export_output(self, count: int, filename: Path | str) -> None:
         print(EXPORT_OUTPUT.render(count=count, filename=filename))
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        labels = [REPORT_LABELS[group].title() for group in group_by]
+        grand_total = report_total(totals, group_by)
+        print(REPORT.render(labels=labels, totals=totals, grand_total=grand_total, format_delta=format_delta))
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        print(ROLLUP_OUTPUT.render(rebuild=rebuild))
@@ -1,7 +1,11 @@
+from collections.abc import Sequence
+from datetime import timedelta
 from enum import StrEnum
 from pathlib import Path
+from typing import Any
 
-from ..models import TimeEntry
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from ..utils.datetime_utils import format_delta
 
 
 class OutputType(StrEnum):
@@ -18,6 +22,17 @@ class OutputType(StrEnum):
         return [x.value for x in cls]
 
 
+# report column headings by grouping, for the formatters that label their columns
+REPORT_LABELS: dict[GroupBy, str] = {
+    "day": "day",
+    "week": "week",
+    "month": "month",
+    "project": "project",
+    "project-prefix": "project prefix",
+    "tag": "tag",
+}
+
+
 class OutputFormatter:
     """The Base OutputFormatter class that all output classes should inherit from."""
 
@@ -32,3 +47,33 @@ class OutputFormatter:
 
     def export_output(self, count: int, filename: Path | str) -> None:
         raise NotImplementedError("output method is not implemented")
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        raise NotImplementedError("output method is not implemented")
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        raise NotImplementedError("output method is not implemented")
+
+
+def report_rows(totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> list[dict[str, Any]]:
+    """One dict per total: the group values keyed by grouping, then duration, seconds and count"""
+    return [
+        {
+            **dict(zip(group_by, total.key, strict=True)),
+            "duration": format_delta(total.duration),
+            "seconds": int(total.duration.total_seconds()),
+            "count": total.count,
+        }
+        for total in totals
+    ]
+
+
+def report_total(totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> EntryTotal | None:
+    """The grand total of a grouped report
+
+    None without groupings (the only row is the total) or when grouped by tag, where an entry counts once
+    per tag and the rows don't add up.
+    """
+    if not group_by or "tag" in group_by:
+        return None
+    return EntryTotal((), sum((total.duration for total in totals), timedelta(0)), sum(total.count for total in totals))
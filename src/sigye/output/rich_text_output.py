@@ -1,13 +1,14 @@
+from collections.abc import Sequence
 from datetime import date, timedelta
 from pathlib import Path
 
 from rich.console import Console
 from rich.table import Table
 
-from ..models import TimeEntry
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
 from ..utils.datetime_utils import format_delta
 from ..utils.translation import gettext as _
-from .output import OutputFormatter
+from .output import REPORT_LABELS, OutputFormatter, report_total
 
 ABBR_ID_LENGTH = 4
 
@@ -91,3 +92,32 @@ class RichTextOutput(OutputFormatter):
         table.add_row(str(count), str(filename))
         console = Console()
         console.print(table)
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        styles = {"day": "cyan", "week": "cyan", "month": "cyan", "project": "green", "project-prefix": "green"}
+        table = Table(title=_("Time Report"))
+        for group in group_by:
+            table.add_column(_(REPORT_LABELS[group]), style=styles.get(group, "red"))
+        table.add_column(_("delta"), justify="right", style="magenta")
+        table.add_column(_("entries"), justify="right", style="#707070")
+        for total in totals:
+            table.add_row(*total.key, format_delta(total.duration), str(total.count))
+        if (grand_total := report_total(totals, group_by)) is not None:
+            table.add_section()
+            table.add_row(
+                _("total"),
+                *[""] * (len(group_by) - 1),
+                format_delta(grand_total.duration),
+                str(grand_total.count),
+                style="yellow",
+            )
+        console = Console()
+        console.print(table)
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        table = Table(title=_("Rollups"))
+        table.add_column(_("days"), justify="right")
+        table.add_column(_("out of date"), style="red")
+        table.add_row(str(rebuild.days), "\n".join(rebuild.outdated) or "-")
+        console = Console()
+        console.print(table)
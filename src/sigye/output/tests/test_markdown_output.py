@@ -1,4 +1,6 @@
-from ...models import TimeEntry
+from datetime import timedelta
+
+from ...models import EntryTotal, TimeEntry
 from ..markdown_output import MarkdownOutput
 
 
@@ -51,3 +53,13 @@ def test_markdown_no_entry():
     output = MarkdownOutput()
     output.single_entry_output(None)
     # TODO: Check the output
+
+
+def test_markdown_report(capsys):
+    totals = [EntryTotal(("abc",), timedelta(hours=3), 2), EntryTotal(("def",), timedelta(hours=1), 1)]
+    output = MarkdownOutput()
+    output.report_output(totals, ["project-prefix"])
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert lines[2] == "| Project Prefix | Delta | Entries |"
+    assert lines[4] == "| abc | 3 hours | 2 |"
+    assert lines[-1] == "| **total** | **4 hours** | **3** |"
@@ -1,6 +1,9 @@
+from datetime import timedelta
+
+from ...models import EntryTotal
 from .. import create_output_formatter
 from ..json_output import JsonOutput
-from ..output import OutputFormatter
+from ..output import OutputFormatter, report_rows, report_total
 from ..rich_text_output import RichTextOutput
 from ..text_output import RawTextOutput
 
@@ -18,3 +21,20 @@ def test_output():
 
     output = create_output_formatter("json", force=True)
     assert isinstance(output, JsonOutput)
+
+
+def test_report_rows():
+    totals = [
+        EntryTotal(("2021-01-04", "abc"), timedelta(hours=3), 2),
+        EntryTotal(("2021-01-11", "abc"), timedelta(minutes=30), 1),
+    ]
+    assert report_rows(totals, ["week", "project"])[0] == {
+        "week": "2021-01-04",
+        "project": "abc",
+        "duration": "3 hours",
+        "seconds": 10800,
+        "count": 2,
+    }
+    assert report_total(totals, ["week", "project"]) == EntryTotal((), timedelta(hours=3, minutes=30), 3)
+    assert report_total(totals, ["week", "tag"]) is None  # entries count once per tag
+    assert report_total(totals[:1], []) is None
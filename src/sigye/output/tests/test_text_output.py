@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 
-from ...models import TimeEntry
+from ...models import EntryRecord, EntryTotal, RollupRebuild, TimeEntry
 from ..text_output import RawTextOutput
 
 
@@ -22,3 +22,28 @@ def test_raw_text_output():
     output.multiple_entries_output([t1, t2])
 
     # TODO: add assertions for the output
+
+
+def test_raw_text_output_records(capsys):
+    entry = TimeEntry(start_time="2021-01-01T09:00:00-05:00", project="test-project", tags=["testtag"])
+
+    output = RawTextOutput()
+    output.single_entry_output(entry)
+    output.single_entry_output(EntryRecord.from_entry(entry))
+
+    entry_line, record_line = capsys.readouterr().out.splitlines()
+    assert record_line == entry_line
+
+
+def test_raw_text_report_output(capsys):
+    totals = [
+        EntryTotal(("2021-01-04", ""), timedelta(minutes=30), 1),
+        EntryTotal(("2021-01-04", "tag1"), timedelta(hours=2), 3),
+    ]
+    RawTextOutput().report_output(totals, ["day", "tag"])
+    assert capsys.readouterr().out.splitlines() == ["2021-01-04 - 0.5 hours 1", "2021-01-04 tag1 2 hours 3"]
+
+
+def test_raw_text_rollup_output(capsys):
+    RawTextOutput().rollup_output(RollupRebuild(12, ["2021-01-04"]))
+    assert capsys.readouterr().out.splitlines() == ["Rebuilt rollups for 12 days, 1 out of date", "2021-01-04"]
@@ -1,12 +1,14 @@
+from collections.abc import Sequence
 from pathlib import Path
 
-from ..models import TimeEntry
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from ..utils.datetime_utils import format_delta
 from .output import OutputFormatter
 
 
 class RawTextOutput(OutputFormatter):
     def _entry_to_str(self, entry: TimeEntry) -> str:
-        return f"{entry.id} {entry.start_time} {entry.end_time} {entry.project} {entry.comment} {entry.tags}"
+        return f"{entry.id} {entry.start_time} {entry.end_time} {entry.project} {entry.comment} {set(entry.tags)}"
 
     def single_entry_output(self, entry: TimeEntry | None) -> None:
         if entry is None:
@@ -20,3 +22,13 @@ class RawTextOutput(OutputFormatter):
 
     def export_output(self, count: int, filename: Path | str) -> None:
         return print(f"Exported {count} entries to {filename}")
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        for total in totals:
+            key = " ".join(value or "-" for value in total.key)  # "-" for the untagged group
+            print(f"{key} {format_delta(total.duration)} {total.count}".lstrip())
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        print(f"Rebuilt rollups for {rebuild.days} days, {len(rebuild.outdated)} out of date")
+        for day in rebuild.outdated:
+            print(day)
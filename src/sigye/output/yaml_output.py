@@ -1,9 +1,10 @@
+from collections.abc import Sequence
 from pathlib import Path
 
 import ryaml
 
-from ..models import TimeEntry
-from .output import OutputFormatter
+from ..models import EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from .output import OutputFormatter, report_rows
 
 
 class YamlOutput(OutputFormatter):
@@ -17,3 +18,9 @@ class YamlOutput(OutputFormatter):
 
     def export_output(self, count: int, filename: Path | str) -> None:
         print("")
+
+    def report_output(self, totals: list[EntryTotal], group_by: Sequence[GroupBy]) -> None:
+        print(ryaml.dumps({"totals": report_rows(totals, group_by)}))
+
+    def rollup_output(self, rebuild: RollupRebuild) -> None:
+        print(ryaml.dumps(rebuild._asdict()))
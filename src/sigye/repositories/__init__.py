@@ -1,5 +1,11 @@
 from .time_entry_repo import TimeEntryRepository
 from .time_entry_repo_file import TimeEntryRepositoryFile
 from .time_entry_repo_orm import TimeEntryRepositoryORM
+from .time_entry_repo_partitioned import TimeEntryRepositoryPartitioned
 
-__all__ = ["TimeEntryRepository", "TimeEntryRepositoryFile", "TimeEntryRepositoryORM"]
+__all__ = [
+    "TimeEntryRepository",
+    "TimeEntryRepositoryFile",
+    "TimeEntryRepositoryORM",
+    "TimeEntryRepositoryPartitioned",
+]
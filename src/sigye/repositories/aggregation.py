@@ -0,0 +1,49 @@
+from collections.abc import Iterable, Sequence
+from datetime import date, datetime, timedelta
+
+from ..models import EntryTotal, GroupBy, project_prefix
+
+
+class Totals:
+    """Accumulates entry durations per group key in a single pass"""
+
+    def __init__(self, group_by: Sequence[GroupBy], now: datetime | None = None):
+        self.group_by = tuple(group_by)
+        self.now = now or datetime.now().astimezone()
+        self._totals: dict[tuple[str, ...], list] = {}
+        self._days: dict[date, dict[str, str]] = {}  # day, week and month keys of the days seen
+
+    def _keys(self, day: date, project: str, tags: Iterable[str]) -> Iterable[tuple[str, ...]]:
+        if (day_values := self._days.get(day)) is None:
+            day_values = self._days[day] = {
+                "day": day.isoformat(),
+                "week": (day - timedelta(days=day.weekday())).isoformat(),
+                "month": day.isoformat()[:7],
+            }
+        values = {**day_values, "project": project, "project-prefix": project_prefix(project)}
+        if "tag" not in self.group_by:
+            return [tuple(values[group] for group in self.group_by)]
+        return [tuple(tag if group == "tag" else values[group] for group in self.group_by) for tag in tags or [""]]
+
+    def add(self, start_time: datetime, end_time: datetime | None, project: str, tags: Iterable[str]) -> None:
+        if end_time is None:  # still running: count it up to now
+            end_time = self.now if start_time.tzinfo else self.now.replace(tzinfo=None)
+        duration = end_time - start_time
+        for key in self._keys(start_time.date(), project, tags):
+            self.add_total(EntryTotal(key, duration, 1))
+
+    def add_day(self, day: date, project: str, tags: Iterable[str], duration: timedelta, count: int) -> None:
+        """Merge the total of several entries starting on day with the same project and tags"""
+        for key in self._keys(day, project, tags):
+            self.add_total(EntryTotal(key, duration, count))
+
+    def add_total(self, total: EntryTotal) -> None:
+        """Merge an already computed total (e.g. from another partition)"""
+        if (current := self._totals.get(total.key)) is None:
+            self._totals[total.key] = [total.duration, total.count]
+        else:
+            current[0] += total.duration
+            current[1] += total.count
+
+    def result(self) -> list[EntryTotal]:
+        return [EntryTotal(key, duration, count) for key, (duration, count) in sorted(self._totals.items())]
@@ -0,0 +1,231 @@
+from collections.abc import Iterable, Sequence
+from datetime import UTC, date, datetime, timedelta
+from math import floor, prod
+
+from ..models import EntryListFilter, EntryRecord, EntryTotal, GroupBy, project_prefix
+from .time_entry_repo import TimeEntryRepository
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional: batches then keep their columns in lists
+    np = None
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _month_number(day: date) -> int:
+    """Months since January 1970, as NumPy's datetime64[M] counts them"""
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+class EntryBatch:
+    """Entries in columns, for totals and checks over long histories
+
+    Start and end times are whole epoch seconds (int64 arrays with NumPy), projects are codes into
+    ``projects`` (each mapped onto a code into ``prefixes``) and tags are (entry, code) pairs into
+    ``tags``, with "" standing in for an untagged entry. With NumPy installed the calculations are
+    vectorized, otherwise they loop over lists and give the same results.
+    """
+
+    def __init__(self, records: Iterable[EntryRecord], *, vectorized: bool | None = None):
+        self.vectorized = np is not None if vectorized is None else vectorized
+        if self.vectorized and np is None:
+            raise ImportError("vectorized batches need numpy")
+        self.ids: list[str] = []
+        self.projects: list[str] = []
+        self.tags: list[str] = []
+        start, end, running, offset, naive, project, tag_entry, tag = ([] for _ in range(8))
+        project_codes: dict[str, int] = {}
+        tag_codes: dict[str, int] = {}
+        offsets = {}
+        for n, record in enumerate(records):
+            self.ids.append(record.id)
+            start.append(floor(record.start))
+            end.append(floor(record.end) if record.end is not None else floor(record.start))
+            running.append(record.end is None)
+            if record.tz not in offsets:
+                offsets[record.tz] = int(record.tz.utcoffset(None).total_seconds()) if record.tz else 0
+            offset.append(offsets[record.tz])
+            naive.append(record.tz is None)
+            project.append(project_codes.setdefault(record.project, len(project_codes)))
+            for name in record.tags or ("",):
+                tag_entry.append(n)
+                tag.append(tag_codes.setdefault(name, len(tag_codes)))
+        self.projects = list(project_codes)
+        self.tags = list(tag_codes)
+        # project code -> prefix code
+        prefix_codes: dict[str, int] = {}
+        project_prefix_code = [
+            prefix_codes.setdefault(project_prefix(name), len(prefix_codes)) for name in self.projects
+        ]
+        self.prefixes = list(prefix_codes)
+        if self.vectorized:
+            start, end, offset, project, tag_entry, tag = (
+                np.array(column, dtype=np.int64) for column in (start, end, offset, project, tag_entry, tag)
+            )
+            running, naive = np.array(running, dtype=bool), np.array(naive, dtype=bool)
+            project_prefix_code = np.array(project_prefix_code, dtype=np.int64)
+        self.start, self.end, self.running, self.offset, self.naive = start, end, running, offset, naive
+        self.project, self.tag_entry, self.tag = project, tag_entry, tag
+        self.project_prefix_code = project_prefix_code
+
+    @classmethod
+    def from_repository(
+        cls, repository: TimeEntryRepository, *, filter: EntryListFilter | None = None, vectorized: bool | None = None
+    ) -> "EntryBatch":
+        return cls(repository.iter_records(filter=filter), vectorized=vectorized)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _now_seconds(now: datetime | None) -> tuple[int, int]:
+        """Epoch seconds of now for aware and for naive (local wall clock, kept as if UTC) start times"""
+        now = now or datetime.now().astimezone()
+        if now.tzinfo is None:
+            now = now.astimezone()
+        wall_clock = now.replace(tzinfo=UTC)
+        return floor(now.timestamp()), floor(wall_clock.timestamp())
+
+    def durations(self, now: datetime | None = None):
+        """Seconds per entry, with running entries counted up to now (the current time by default)"""
+        aware_now, naive_now = self._now_seconds(now)
+        if self.vectorized:
+            ends = np.where(self.running, np.where(self.naive, naive_now, aware_now), self.end)
+            return ends - self.start
+        return [
+            ((naive_now if naive else aware_now) if running else end) - start
+            for start, end, running, naive in zip(self.start, self.end, self.running, self.naive, strict=True)
+        ]
+
+    def total(self, now: datetime | None = None) -> timedelta:
+        durations = self.durations(now)
+        return timedelta(seconds=int(durations.sum()) if self.vectorized else sum(durations))
+
+    def totals(self, group_by: Sequence[GroupBy], now: datetime | None = None) -> list[EntryTotal]:
+        """Total duration and number of entries per group key, ordered by key, as ``Totals`` gives them"""
+        group_by = tuple(group_by)
+        durations = self.durations(now)
+        # with tags each (entry, tag) pair is a row, otherwise each entry
+        if self.vectorized:
+            rows = self.tag_entry if "tag" in group_by else np.arange(len(self))
+            keys, seconds, counts = self._group_vectorized(
+                self._group_codes_vectorized(group_by, rows), durations[rows]
+            )
+        else:
+            rows = self.tag_entry if "tag" in group_by else range(len(self))
+            codes = self._group_codes_python(group_by, rows)
+            totals: dict[tuple[int, ...], list[int]] = {}
+            for row, key in zip(rows, zip(*codes, strict=True) if codes else [()] * len(rows), strict=True):
+                if (current := totals.get(key)) is None:
+                    totals[key] = [durations[row], 1]
+                else:
+                    current[0] += durations[row]
+                    current[1] += 1
+            keys = list(totals)
+            seconds = [total for total, _ in totals.values()]
+            counts = [count for _, count in totals.values()]
+        return sorted(
+            EntryTotal(
+                tuple(self._decode(group, code) for group, code in zip(group_by, key, strict=True)),
+                timedelta(seconds=int(total)),
+                count,
+            )
+            for key, total, count in zip(keys, seconds, counts, strict=True)
+        )
+
+    @staticmethod
+    def _group_vectorized(columns: list, durations) -> tuple[list, list, list]:
+        """Group keys (as tuples of codes) with their total seconds and row counts
+
+        The code columns are packed into one int64 key per row. A small key space is counted directly
+        with bincount; a larger one is sorted once with unique.
+        """
+        if not len(durations):
+            return [], [], []
+        bases = [(int(column.min()), int(column.max() - column.min()) + 1) for column in columns]
+        space = prod(size for _, size in bases)
+        if columns and space >= 2**62:  # too many combinations to pack: sort the rows of codes instead
+            keys, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            seconds = np.bincount(inverse, weights=durations, minlength=len(keys))
+            counts = np.bincount(inverse, minlength=len(keys))
+            return [tuple(key) for key in keys.tolist()], seconds.tolist(), counts.tolist()
+        key = np.zeros(len(durations), dtype=np.int64)
+        for column, (low, size) in zip(columns, bases, strict=True):
+            key = key * size + (column - low)
+        if space <= 4 * len(durations):
+            counts = np.bincount(key, minlength=space)
+            present = np.flatnonzero(counts)
+            seconds = np.bincount(key, weights=durations, minlength=space)[present]
+            counts = counts[present]
+        else:
+            present, inverse = np.unique(key, return_inverse=True)
+            seconds = np.bincount(inverse, weights=durations, minlength=len(present))
+            counts = np.bincount(inverse, minlength=len(present))
+        codes = []
+        for low, size in reversed(bases):
+            codes.append((present % size + low).tolist())
+            present = present // size
+        keys = list(zip(*reversed(codes), strict=True)) if codes else [()] * len(present)
+        return keys, seconds.tolist(), counts.tolist()
+
+    def _group_codes_vectorized(self, group_by: tuple[GroupBy, ...], rows) -> list:
+        """One integer column per grouping: epoch day numbers, month numbers or dictionary codes"""
+        local_day = (self.start[rows] + self.offset[rows]) // SECONDS_PER_DAY
+        columns = {
+            "day": lambda: local_day,
+            "week": lambda: local_day - (local_day + 3) % 7,  # 1970-01-01 was a Thursday
+            "month": lambda: local_day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64),
+            "project": lambda: self.project[rows],
+            "project-prefix": lambda: self.project_prefix_code[self.project[rows]],
+            "tag": lambda: self.tag,
+        }
+        return [columns[group]() for group in group_by]
+
+    def _group_codes_python(self, group_by: tuple[GroupBy, ...], rows: Iterable[int]) -> list[list[int]]:
+        local_day = [(self.start[row] + self.offset[row]) // SECONDS_PER_DAY for row in rows]
+        months: dict[int, int] = {}
+        for day in set(local_day) if "month" in group_by else ():
+            months[day] = _month_number(date.fromordinal(EPOCH_ORDINAL + day))
+        columns = {
+            "day": lambda: local_day,
+            "week": lambda: [day - (day + 3) % 7 for day in local_day],
+            "month": lambda: [months[day] for day in local_day],
+            "project": lambda: [self.project[row] for row in rows],
+            "project-prefix": lambda: [self.project_prefix_code[self.project[row]] for row in rows],
+            "tag": lambda: self.tag,
+        }
+        return [columns[group]() for group in group_by]
+
+    def _decode(self, group: GroupBy, code: int) -> str:
+        match group:
+            case "day" | "week":
+                return date.fromordinal(EPOCH_ORDINAL + code).isoformat()
+            case "month":
+                return f"{1970 + code // 12:04}-{code % 12 + 1:02}"
+            case "project":
+                return self.projects[code]
+            case "project-prefix":
+                return self.prefixes[code]
+            case "tag":
+                return self.tags[code]
+
+    def overlapping_ids(self, now: datetime | None = None) -> list[str]:
+        """Ids of the entries starting before an entry that started earlier has ended, in start order"""
+        ends = self.durations(now)
+        if self.vectorized:
+            ends = ends + self.start
+            order = np.argsort(self.start, kind="stable")
+            previous_end = np.maximum.accumulate(ends[order])
+            overlapping = order[1:][self.start[order][1:] < previous_end[:-1]]
+            return [self.ids[n] for n in overlapping.tolist()]
+        overlapping = []
+        latest_end = None
+        for n in sorted(range(len(self)), key=self.start.__getitem__):
+            if latest_end is not None and self.start[n] < latest_end:
+                overlapping.append(self.ids[n])
+            end = self.start[n] + ends[n]
+            latest_end = end if latest_end is None else max(latest_end, end)
+        return overlapping
@@ -0,0 +1,94 @@
+from bisect import bisect_right
+from collections.abc import Callable, Iterable
+from datetime import date, timedelta
+
+from ..models import PROJECT_WILDCARDS, EntryListFilter
+
+Predicate = Callable[[dict], bool]
+
+
+def compile_filter(filter: EntryListFilter, *, dates: bool = True) -> Predicate:
+    """Compile filter into a predicate over stored entry dicts, built from only its active clauses
+
+    Clauses are checked in turn and the first failing one ends the check, so an empty filter costs a
+    single call per entry. Repositories that already bisected the entries into the date window pass
+    ``dates=False`` to leave the date clauses out.
+    """
+    clauses = []
+    if filter.id:
+        clauses.append(_id_clause(filter.id))
+    if dates and (filter.start_date or filter.end_date):
+        clauses.append(_date_clause(filter.start_date, filter.end_date))
+    if filter.projects and (clause := _project_clause(filter.projects)):
+        clauses.append(clause)
+    if filter.tags:
+        clauses.append(_tag_clause(frozenset(filter.tags)))
+
+    if not clauses:
+        return _match_all
+    predicate = clauses[0]
+    for clause in clauses[1:]:
+        predicate = _both(predicate, clause)
+    return predicate
+
+
+def _match_all(entry: dict) -> bool:
+    return True
+
+
+def _both(first: Predicate, second: Predicate) -> Predicate:
+    # chained ``and`` calls cost far less per entry than all() over a generator
+    return lambda entry: first(entry) and second(entry)
+
+
+def _id_clause(partial_id: str) -> Predicate:
+    return lambda entry: entry["id"].startswith(partial_id)
+
+
+def _date_clause(start_date: date | None, end_date: date | None) -> Predicate:
+    """Compare ISO start times directly against precomputed date keys
+
+    The first ten characters of a start time are its local date. A start time sorts at or after its own
+    date and before the next day, so no slicing is needed.
+    """
+    start_key = start_date.isoformat() if start_date else ""
+    if end_date is None or end_date == date.max:
+        return lambda entry: entry["start_time"] >= start_key
+    end_key = (end_date + timedelta(days=1)).isoformat()
+    return lambda entry: start_key <= entry["start_time"] < end_key
+
+
+def _project_clause(projects: Iterable[str]) -> Predicate | None:
+    """Exact names are looked up in a set and wildcard prefixes in one sorted table
+
+    None means every project matches (a bare wildcard).
+    """
+    exact = frozenset(project for project in projects if project[-1] not in PROJECT_WILDCARDS)
+    prefixes = _merge_prefixes(project[:-1] for project in projects if project[-1] in PROJECT_WILDCARDS)
+    if prefixes == [""]:
+        return None
+    if not prefixes:
+        return lambda entry: entry["project"] in exact
+
+    def clause(entry: dict) -> bool:
+        project = entry["project"]
+        if project in exact:
+            return True
+        # with no prefix starting with another, only the greatest prefix <= project can match it
+        n = bisect_right(prefixes, project)
+        return n > 0 and project.startswith(prefixes[n - 1])
+
+    return clause
+
+
+def _merge_prefixes(prefixes: Iterable[str]) -> list[str]:
+    """Sorted prefixes without the ones another prefix already covers"""
+    merged = []
+    for prefix in sorted(set(prefixes)):
+        if not merged or not prefix.startswith(merged[-1]):
+            merged.append(prefix)
+    return merged
+
+
+def _tag_clause(tags: frozenset[str]) -> Predicate:
+    return lambda entry: not tags.isdisjoint(entry.get("tags", ()))
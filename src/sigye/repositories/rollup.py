@@ -0,0 +1,87 @@
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta
+
+from ..models import EntryListFilter
+from .aggregation import Totals
+from .predicate import compile_filter
+
+RollupGroup = tuple[str, tuple[str, ...]]  # project and sorted tags
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _day(entry: dict) -> str:
+    return entry["start_time"][:10]
+
+
+class DailyRollups:
+    """Total duration and number of the finished entries per local start day, project and set of tags
+
+    Keeping whole tag sets (rather than single tags) lets the same rollups answer reports grouped by
+    tag, where an entry counts once per tag, and every other grouping, where it counts once. A day is
+    always recomputed from all of its entries, so a change only touches the days it affects. Running
+    entries are kept as stored and counted up to the report's now.
+    """
+
+    def __init__(self):
+        # day -> group -> [microseconds, count]; plain ints keep the kept rollups quick to load
+        self.days: dict[str, dict[RollupGroup, list[int]]] = {}
+        self.running: list[dict] = []
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[dict]) -> "DailyRollups":
+        """Rollups of stored entry dicts"""
+        rollups = cls()
+        for entry in entries:
+            rollups._add(entry)
+        return rollups
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[str, str, Iterable[str], timedelta, int]]) -> "DailyRollups":
+        """Rollups of already grouped (day, project, tags, duration, count) rows"""
+        rollups = cls()
+        for day, project, tags, duration, count in rows:
+            rollups.days.setdefault(day, {})[project, tuple(sorted(tags))] = [duration // MICROSECOND, count]
+        return rollups
+
+    def _add(self, entry: dict) -> None:
+        end_time = entry.get("end_time")
+        if not end_time:
+            self.running.append(entry)
+            return
+        duration = (datetime.fromisoformat(end_time) - datetime.fromisoformat(entry["start_time"])) // MICROSECOND
+        groups = self.days.setdefault(_day(entry), {})
+        group = (entry["project"], tuple(sorted(entry.get("tags", ()))))
+        if (current := groups.get(group)) is None:
+            groups[group] = [duration, 1]
+        else:
+            current[0] += duration
+            current[1] += 1
+
+    def replace_days(self, days: set[str], entries: Iterable[dict]) -> None:
+        """Recompute days from entries, which include every stored entry starting on one of them"""
+        for day in days:
+            self.days.pop(day, None)
+        self.running = [entry for entry in self.running if _day(entry) not in days]
+        for entry in entries:
+            if _day(entry) in days:
+                self._add(entry)
+
+    def add_to(self, totals: Totals, filter: EntryListFilter | None = None) -> None:
+        """Merge the totals of the groups (and running entries) matching filter, which can't select by id"""
+        matching = compile_filter(filter) if filter else None
+        for day, groups in self.days.items():
+            start_date = date.fromisoformat(day)
+            for (project, tags), (microseconds, count) in groups.items():
+                # a group looks enough like a stored entry (starting on its day) for the filter predicate
+                if matching is None or matching({"start_time": day, "project": project, "tags": tags}):
+                    totals.add_day(start_date, project, tags, timedelta(microseconds=microseconds), count)
+        for entry in self.running:
+            if matching is None or matching(entry):
+                totals.add(datetime.fromisoformat(entry["start_time"]), None, entry["project"], entry.get("tags", ()))
+
+    def outdated_days(self, kept: "DailyRollups") -> list[str]:
+        """Days on which kept (e.g. maintained incrementally) disagrees with these rollups"""
+        days = {day for day in self.days.keys() | kept.days.keys() if self.days.get(day) != kept.days.get(day)}
+        days.update(_day(entry) for entry in self.running if entry not in kept.running)
+        days.update(_day(entry) for entry in kept.running if entry not in self.running)
+        return sorted(days)
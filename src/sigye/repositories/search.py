@@ -0,0 +1,56 @@
+import re
+from bisect import bisect_left
+from collections.abc import Iterable
+
+WORD = re.compile(r"\w+")
+QUERY_TERM = re.compile(r"(\w+)(\*?)")
+
+Term = tuple[str, bool]  # (word, matches as a prefix)
+
+
+def tokenize(text: str) -> list[str]:
+    """Case-folded words of text"""
+    return WORD.findall(text.casefold())
+
+
+def parse_query(query: str) -> list[Term]:
+    """Words to search for; a word followed by * matches every word starting with it"""
+    return [(word, bool(star)) for word, star in QUERY_TERM.findall(query.casefold())]
+
+
+def matches(terms: list[Term], words: Iterable[str]) -> bool:
+    """Whether words contain every term"""
+    words = set(words)
+    return all(any(w.startswith(word) for w in words) if prefix else word in words for word, prefix in terms)
+
+
+def fts5_query(terms: list[Term]) -> str:
+    """FTS5 MATCH expression requiring every term (each quoted, so nothing is read as query syntax)"""
+    return " AND ".join(f'"{word}"' + ("*" if prefix else "") for word, prefix in terms)
+
+
+class SearchIndex:
+    """Inverted index of words to the keys of the texts containing them"""
+
+    def __init__(self, texts: Iterable[tuple[str, str]]):
+        self._keys: dict[str, set[str]] = {}
+        for key, text in texts:
+            for word in tokenize(text):
+                self._keys.setdefault(word, set()).add(key)
+        self._words = sorted(self._keys)
+
+    def _lookup(self, word: str, prefix: bool) -> set[str]:
+        if not prefix:
+            return self._keys.get(word, set())
+        keys = set()
+        for n in range(bisect_left(self._words, word), len(self._words)):
+            if not self._words[n].startswith(word):
+                break
+            keys |= self._keys[self._words[n]]
+        return keys
+
+    def search(self, terms: list[Term]) -> set[str]:
+        """Keys of the texts containing every term"""
+        if not terms:
+            return set()
+        return set.intersection(*(self._lookup(word, prefix) for word, prefix in terms))
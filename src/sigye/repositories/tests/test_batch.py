@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from ...models import EntryListFilter, EntryRecord, TimeEntry
+from .. import batch
+from ..batch import EntryBatch
+from ..time_entry_repo_file import TimeEntryRepositoryFile
+from .test_repo_file import make_aggregation_entries, make_prefix_entries
+
+VECTORIZED = [
+    pytest.param(True, marks=pytest.mark.skipif(batch.np is None, reason="numpy is not installed")),
+    False,
+]
+NOW = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+
+
+@pytest.mark.parametrize("vectorized", VECTORIZED)
+@pytest.mark.parametrize(
+    "group_by",
+    [[], ["day"], ["week"], ["month"], ["project"], ["project-prefix"], ["tag"], ["week", "project"]]
+    + [["project", "tag", "day"], ["project-prefix", "project"]],
+)
+def test_entry_batch_totals(tmp_path, vectorized, group_by):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(make_aggregation_entries() + make_prefix_entries())
+    entries = EntryBatch.from_repository(repo, vectorized=vectorized)
+    assert entries.totals(group_by, now=NOW) == repo.aggregate(group_by, now=NOW)
+
+
+@pytest.mark.parametrize("vectorized", VECTORIZED)
+def test_entry_batch_durations(tmp_path, vectorized):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(make_aggregation_entries())
+    entries = EntryBatch.from_repository(repo, vectorized=vectorized)
+    assert list(entries.durations(now=NOW)) == [5400, 10800, 2700, 7200]  # the running entry counts up to now
+    assert entries.total(now=NOW) == timedelta(hours=7, minutes=15)
+
+    entries = EntryBatch.from_repository(repo, filter=EntryListFilter(projects={"def"}), vectorized=vectorized)
+    assert entries.projects == ["def"]
+    assert entries.totals(["tag"], now=NOW) == repo.aggregate(
+        ["tag"], filter=EntryListFilter(projects={"def"}), now=NOW
+    )
+
+
+@pytest.mark.parametrize("vectorized", VECTORIZED)
+def test_entry_batch_overlaps(vectorized):
+    entries = [
+        TimeEntry(id="a", project="p", start_time="2021-01-01T09:00:00+00:00", end_time="2021-01-01T11:00:00+00:00"),
+        TimeEntry(id="b", project="p", start_time="2021-01-01T05:30:00-05:00", end_time="2021-01-01T12:00:00-05:00"),
+        TimeEntry(id="c", project="p", start_time="2021-01-01T12:00:00+00:00", end_time="2021-01-01T13:00:00+00:00"),
+        TimeEntry(id="d", project="p", start_time="2021-01-01T12:30:00+00:00"),
+        TimeEntry(id="e", project="p", start_time="2021-01-01T09:00:00+09:00", end_time="2021-01-01T09:30:00+09:00"),
+    ]
+    entries = EntryBatch(map(EntryRecord.from_entry, entries), vectorized=vectorized)
+    assert entries.overlapping_ids(now=NOW) == ["b", "c", "d"]
+    assert EntryBatch([], vectorized=vectorized).overlapping_ids() == []
+    assert EntryBatch([], vectorized=vectorized).totals(["day"]) == []
+
+
+def test_entry_batch_without_numpy():
+    with mock.patch.object(batch, "np", None):
+        assert not EntryBatch([]).vectorized
+        with pytest.raises(ImportError):
+            EntryBatch([], vectorized=True)
@@ -1,12 +1,23 @@
 import io
 import json
+from datetime import datetime, timedelta
+from unittest import mock
 
 import pytest
 import rtoml as toml
 import ryaml
 
-from ...models import TimeEntry
-from ..time_entry_repo_file import FormatFactory, JSONFormat, TimeEntryRepositoryFile, TOMLFormat, YAMLFormat
+from ...models import EntryListFilter, EntryTotal, TimeEntry
+from ...utils.file_utils import fcntl, file_lock
+from ..predicate import compile_filter
+from ..time_entry_repo_file import (
+    FormatFactory,
+    JournalFormat,
+    JSONFormat,
+    TimeEntryRepositoryFile,
+    TOMLFormat,
+    YAMLFormat,
+)
 
 
 def test_file_format_factory():
@@ -15,6 +26,7 @@ def test_file_format_factory():
     assert isinstance(factory.get_format("toml"), TOMLFormat)
     assert isinstance(factory.get_format("json"), JSONFormat)
     assert isinstance(factory.get_format("yml"), YAMLFormat)
+    assert isinstance(factory.get_format("sigyelog"), JournalFormat)
     with pytest.raises(ValueError):
         factory.get_format("unknown")
 
@@ -49,8 +61,63 @@ def test_json_format():
         assert json.dumps(data) == f.read()
 
 
+def test_journal_format():
+    fmt = JournalFormat()
+    data = {"entries": [{"id": "b", "start_time": "2021-01-02T00:00:00"}]}
+    with io.StringIO() as f:
+        fmt.save_data(data, f)
+        fmt.append_record({"op": "save", "entry": {"id": "a", "start_time": "2021-01-01T00:00:00"}}, f)
+        fmt.append_record({"op": "save", "entry": {"id": "c", "start_time": "2021-01-03T00:00:00"}}, f)
+        fmt.append_record({"op": "delete", "id": "b"}, f)
+        f.write('{"op": "sa')  # torn trailing record
+        f.seek(0)
+        assert fmt.load_data(f) == {
+            "entries": [
+                {"id": "a", "start_time": "2021-01-01T00:00:00"},
+                {"id": "c", "start_time": "2021-01-03T00:00:00"},
+            ]
+        }
+    assert fmt.pending_records == 3
+
+
+def test_journal_repo_appends_and_compacts(tmp_path):
+    filename = tmp_path / "test.sigyelog"
+    repo = TimeEntryRepositoryFile(filename, compaction_threshold=3)
+    entries = [TimeEntry(project="test", start_time=f"2021-01-0{i}T00:00:00") for i in range(1, 4)]
+    for entry in entries:
+        repo.save(entry)
+    assert len(filename.read_text().splitlines()) == 4
+    assert TimeEntryRepositoryFile(filename).get_all() == entries
+
+    repo.delete_entry(entries[1].id)  # crosses the threshold and compacts
+    assert len(filename.read_text().splitlines()) == 1
+    assert TimeEntryRepositoryFile(filename).get_all() == [entries[0], entries[2]]
+
+    repo.save(entries[1])
+    repo.compact()
+    assert len(filename.read_text().splitlines()) == 1
+    assert TimeEntryRepositoryFile(filename).get_all() == entries
+
+
+def test_journal_repo_recovers_torn_record(tmp_path):
+    filename = tmp_path / "test.sigyelog"
+    repo = TimeEntryRepositoryFile(filename)
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00")
+    repo.save(entry1)
+    with open(filename, "a") as f:
+        f.write('{"op": "sa')  # an append interrupted mid-record
+
+    repo = TimeEntryRepositoryFile(filename)
+    assert repo.get_all() == [entry1]
+    entry2 = TimeEntry(project="test2", start_time="2021-01-02T00:00:00")
+    entry3 = TimeEntry(project="test3", start_time="2021-01-03T00:00:00")
+    repo.save(entry2)
+    repo.save(entry3)
+    assert TimeEntryRepositoryFile(filename).get_all() == [entry1, entry2, entry3]
+
+
 def test_supported_formats():
-    assert FormatFactory.get_supported_formats() == ["yaml", "yml", "toml", "json"]
+    assert FormatFactory.get_supported_formats() == ["yaml", "yml", "toml", "json", "sigyelog"]
 
 
 @pytest.mark.parametrize("fmt", FormatFactory.get_supported_formats())
@@ -84,3 +151,486 @@ def test_time_entry_repo_file(tmp_path, fmt):
     assert repo.filter(filter=None) == [entry]
 
     assert repo.get_by_project("test") == [entry]
+
+
+def test_parse_cache(tmp_path):
+    filename = tmp_path / "test.toml"
+    repo = TimeEntryRepositoryFile(filename)
+    entry = TimeEntry(project="test", start_time="2021-01-01T00:00:00", end_time="2021-01-01T01:00:00")
+    repo.save(entry)
+    cache_file = tmp_path / "test.toml.cache"
+    assert cache_file.exists()
+
+    # a fresh repository is served from the snapshot without parsing the data file
+    with mock.patch.object(TOMLFormat, "load_data", side_effect=AssertionError("parsed")):
+        assert TimeEntryRepositoryFile(filename).get_all() == [entry]
+
+    # an out-of-band edit to the data file invalidates the snapshot
+    entry2 = TimeEntry(project="edited", start_time="2021-01-02T00:00:00")
+    with open(filename, "w") as f:
+        toml.dump({"entries": [entry.model_dump(mode="json"), entry2.model_dump(mode="json")]}, f, none_value=None)
+    assert TimeEntryRepositoryFile(filename).get_all() == [entry, entry2]
+
+    # a corrupt snapshot is ignored and rebuilt
+    cache_file.write_bytes(b"not a pickle")
+    assert TimeEntryRepositoryFile(filename).get_all() == [entry, entry2]
+    assert TimeEntryRepositoryFile(filename, parse_cache=False).get_all() == [entry, entry2]
+
+
+def test_parse_cache_disabled_for_journal(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.sigyelog")
+    repo.save(TimeEntry(project="test", start_time="2021-01-01T00:00:00"))
+    assert not repo.parse_cache
+    assert not (tmp_path / "test.sigyelog.cache").exists()
+
+
+def test_partial_id_lookup(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.yaml")
+    entries = [
+        TimeEntry(id="abc123", project="test", start_time="2021-01-03T00:00:00"),
+        TimeEntry(id="abd456", project="test", start_time="2021-01-01T00:00:00"),
+        TimeEntry(id="abc789", project="test", start_time="2021-01-02T00:00:00"),
+    ]
+    for entry in entries:
+        repo.save(entry)
+
+    assert repo.get_entries_by_partial_id("abc") == [entries[2], entries[0]]
+    assert repo.get_entries_by_partial_id("abd4") == [entries[1]]
+    assert repo.get_entries_by_partial_id("b") == []
+    assert repo.get_entry_by_id("abc789") == entries[2]
+
+    # the index follows saves that move an entry and deletes
+    entries[0].start_time = entries[0].start_time.replace(year=2020)
+    repo.save(entries[0])
+    assert repo.get_entries_by_partial_id("abc") == [entries[0], entries[2]]
+    repo.delete_entry("abc789")
+    assert repo.get_entries_by_partial_id("ab") == [entries[0], entries[1]]
+    assert TimeEntryRepositoryFile(tmp_path / "test.yaml").get_all() == [entries[0], entries[1]]
+
+
+def test_filter_date_window(tmp_path):
+    filename = tmp_path / "test.yaml"
+    entries = [
+        TimeEntry(project="test", start_time="2021-01-01T23:00:00-05:00"),
+        TimeEntry(project="test", start_time="2021-01-02T00:30:00+09:00"),
+        TimeEntry(project="test", start_time="2021-01-02T12:00:00"),
+        TimeEntry(project="test2", start_time="2021-01-03T08:00:00"),
+        TimeEntry(project="test", start_time="2021-01-04T08:00:00"),
+    ]
+    # written out of order, as a hand-edited file might be
+    with open(filename, "w") as f:
+        ryaml.dump(f, {"entries": [entry.model_dump(mode="json") for entry in reversed(entries)]})
+    repo = TimeEntryRepositoryFile(filename)
+
+    assert repo.filter(filter=EntryListFilter(start_date="2021-01-02", end_date="2021-01-03")) == entries[1:4]
+    assert repo.filter(filter=EntryListFilter(start_date="2021-01-02", projects={"test"})) == [
+        entries[1],
+        entries[2],
+        entries[4],
+    ]
+    assert repo.filter(filter=EntryListFilter(end_date="2021-01-01")) == entries[:1]
+    assert repo.filter(filter=EntryListFilter(start_date="2021-01-05")) == []
+    assert repo.filter(filter=EntryListFilter(start_date="2021-01-04", end_date="2021-01-02")) == []
+    with mock.patch(f"{TimeEntryRepositoryFile.__module__}.TimeEntry", wraps=TimeEntry) as constructed:
+        repo.filter(filter=EntryListFilter(start_date="2021-01-03", end_date="2021-01-03"))
+        assert constructed.from_storage.call_count == 1
+
+
+def test_filter_validates_only_matches(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.yaml")
+    entries = [
+        TimeEntry(project="abc-1", start_time="2021-01-01T00:00:00", tags={"tag1"}),
+        TimeEntry(project="abc-2", start_time="2021-01-02T00:00:00", tags={"tag2"}),
+        TimeEntry(project="def", start_time="2021-01-03T00:00:00", tags={"tag1", "tag3"}),
+    ]
+    repo.save_all(entries)
+
+    with mock.patch(f"{TimeEntryRepositoryFile.__module__}.TimeEntry", wraps=TimeEntry) as constructed:
+        assert repo.filter(filter=EntryListFilter(projects={"abc+"})) == entries[:2]
+        assert repo.filter(filter=EntryListFilter(tags={"tag1"})) == [entries[0], entries[2]]
+        assert repo.filter(filter=EntryListFilter(projects={"def"}, tags={"tag2"})) == []
+        assert repo.filter(filter=EntryListFilter(id=entries[1].id[:6])) == [entries[1]]
+        assert constructed.from_storage.call_count == 5
+
+
+@pytest.mark.parametrize("fmt", ["toml", "sigyelog"])
+def test_active_entry_pointer(tmp_path, fmt):
+    filename = tmp_path / f"test.{fmt}"
+    repo = TimeEntryRepositoryFile(filename)
+    assert repo.get_active_entry() is None
+    done = TimeEntry(project="done", start_time="2021-01-01T00:00:00", end_time="2021-01-01T01:00:00")
+    active = TimeEntry(project="active", start_time="2021-01-02T00:00:00")
+    repo.save(done)
+    repo.save(active)
+
+    # a fresh repository answers from the sidecar without loading the entries
+    fresh = TimeEntryRepositoryFile(filename)
+    with mock.patch.object(TimeEntryRepositoryFile, "_load_data", side_effect=AssertionError("loaded")):
+        assert fresh.get_active_entry() == active
+
+    active.stop(end_time=active.start_time.replace(hour=2))
+    repo.save(active)
+    assert TimeEntryRepositoryFile(filename).get_active_entry() is None
+
+    restarted = TimeEntry(project="restarted", start_time="2021-01-03T00:00:00")
+    repo.save(restarted)
+    repo.delete_entry(restarted.id)
+    assert TimeEntryRepositoryFile(filename).get_active_entry() is None
+
+
+def test_active_entry_pointer_stale(tmp_path):
+    filename = tmp_path / "test.toml"
+    repo = TimeEntryRepositoryFile(filename)
+    repo.save(TimeEntry(project="done", start_time="2021-01-01T00:00:00", end_time="2021-01-01T01:00:00"))
+    assert repo.get_active_entry() is None
+
+    # an out-of-band edit leaves the pointer stale, so the entries are scanned again
+    active = TimeEntry(project="active", start_time="2021-01-02T00:00:00")
+    with open(filename, "w") as f:
+        toml.dump({"entries": [active.model_dump(mode="json")]}, f, none_value=None)
+    assert TimeEntryRepositoryFile(filename).get_active_entry() == active
+
+    (tmp_path / "test.toml.active").write_text("garbage")
+    assert TimeEntryRepositoryFile(filename).get_active_entry() == active
+
+
+def test_iter_filter(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    entries = [
+        TimeEntry(project="abc-1", start_time="2021-01-01T00:00:00", tags={"tag1"}),
+        TimeEntry(project="abc-2", start_time="2021-01-02T00:00:00", tags={"tag2"}),
+        TimeEntry(project="def", start_time="2021-01-03T00:00:00", tags={"tag1", "tag3"}),
+    ]
+    repo.save_all(entries)
+
+    iterator = repo.iter_filter()
+    assert next(iterator) == entries[0]
+    repo.delete_entry(entries[1].id)  # changes made while iterating don't affect the iterator
+    assert list(iterator) == entries[1:]
+    assert list(repo.iter_filter(filter=EntryListFilter(tags={"tag1"}, start_date="2021-01-02"))) == [entries[2]]
+
+
+def test_iter_records(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    entries = make_aggregation_entries()
+    repo.save_all(entries)
+
+    with mock.patch(f"{TimeEntryRepositoryFile.__module__}.TimeEntry") as constructed:
+        records = list(repo.iter_records())
+        assert list(repo.iter_records(filter=EntryListFilter(projects={"def"}, last=1))) == records[-1:]
+    assert not constructed.from_storage.called
+    assert [record.to_entry() for record in records] == entries
+
+
+def make_paging_entries() -> list[TimeEntry]:
+    return [
+        TimeEntry(id=f"{i:02}", project="test" if i % 2 else "other", start_time=f"2021-01-{1 + i:02}T09:00:00")
+        for i in range(10)
+    ]
+
+
+@pytest.mark.parametrize(
+    "filter, expected",
+    [
+        (EntryListFilter(limit=3), [0, 1, 2]),
+        (EntryListFilter(limit=3, offset=8), [8, 9]),
+        (EntryListFilter(last=3), [7, 8, 9]),
+        (EntryListFilter(last=3, offset=8), [0, 1]),
+        (EntryListFilter(last=0), []),
+        (EntryListFilter(offset=7), [7, 8, 9]),
+        (EntryListFilter(after="06"), [7, 8, 9]),
+        (EntryListFilter(after="02", limit=2), [3, 4]),
+        (EntryListFilter(projects={"test"}, last=2), [7, 9]),
+        (EntryListFilter(projects={"test"}, after="03", limit=2), [5, 7]),
+        (EntryListFilter(start_date="2021-01-03", end_date="2021-01-06", last=2), [4, 5]),
+    ],
+)
+def test_filter_paging(tmp_path, filter, expected):
+    entries = make_paging_entries()
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(entries)
+    assert repo.filter(filter=filter) == [entries[n] for n in expected]
+    assert list(repo.iter_filter(filter=filter)) == [entries[n] for n in expected]
+
+
+@pytest.mark.parametrize(
+    "projects, expected",
+    [
+        (set(), ["abc", "abc-1", "abc-12", "abd", "def", "x"]),
+        ({"abc"}, ["abc"]),
+        ({"abc+"}, ["abc", "abc-1", "abc-12"]),
+        ({"abc-1.", "abc*", "x"}, ["abc", "abc-1", "abc-12", "x"]),  # overlapping prefixes merge
+        ({"abc-1*", "abd"}, ["abc-1", "abc-12", "abd"]),
+        ({"ab+", "de."}, ["abc", "abc-1", "abc-12", "abd", "def"]),
+        ({"b+", "abc-2+"}, []),
+        ({"*"}, ["abc", "abc-1", "abc-12", "abd", "def", "x"]),
+    ],
+)
+def test_compile_filter_projects(projects, expected):
+    names = ["abc", "abc-1", "abc-12", "abd", "def", "x"]
+    matching = compile_filter(EntryListFilter(projects=projects))
+    assert [name for name in names if matching({"project": name})] == expected
+
+
+def test_compile_filter():
+    entry = {"id": "abcd", "project": "p", "start_time": "2021-01-02T23:30:00-05:00", "tags": ["tag1", "tag2"]}
+    assert compile_filter(EntryListFilter())(entry)
+    assert compile_filter(EntryListFilter(id="ab", tags={"tag2", "tag3"}, start_date="2021-01-02"))(entry)
+    assert not compile_filter(EntryListFilter(id="b"))(entry)
+    assert not compile_filter(EntryListFilter(tags={"tag3"}))(entry)
+    assert not compile_filter(EntryListFilter(tags={"tag1"}))({**entry, "tags": []})
+    # the local date of the start time is what counts
+    assert compile_filter(EntryListFilter(start_date="2021-01-02", end_date="2021-01-02"))(entry)
+    assert not compile_filter(EntryListFilter(start_date="2021-01-03"))(entry)
+    assert not compile_filter(EntryListFilter(end_date="2021-01-01"))(entry)
+    assert compile_filter(EntryListFilter(end_date="2021-01-01"), dates=False)(entry)
+
+
+def test_filter_paging_checks_only_the_page(tmp_path):
+    entries = make_paging_entries()
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(entries)
+    checked = []
+
+    def compile_counting(filter, **kwargs):
+        predicate = compile_filter(filter, **kwargs)
+        return lambda entry: checked.append(entry["id"]) or predicate(entry)
+
+    with mock.patch(f"{TimeEntryRepositoryFile.__module__}.compile_filter", compile_counting):
+        assert repo.filter(filter=EntryListFilter(last=2)) == entries[-2:]
+    assert checked == ["09", "08"]
+    with pytest.raises(KeyError):
+        repo.filter(filter=EntryListFilter(after="unknown"))
+
+
+def make_aggregation_entries() -> list[TimeEntry]:
+    return [
+        TimeEntry(project="abc", start_time="2021-01-01T09:00:00-05:00", end_time="2021-01-01T10:30:00-05:00"),
+        TimeEntry(
+            project="abc",
+            start_time="2021-01-03T22:00:00-05:00",  # a Sunday, ending on Monday
+            end_time="2021-01-04T01:00:00-05:00",
+            tags={"tag1", "tag2"},
+        ),
+        TimeEntry(project="def", start_time="2021-01-04T09:00:00+09:00", end_time="2021-01-04T09:45:00+09:00"),
+        TimeEntry(project="def", start_time="2021-02-01T09:00:00+00:00", tags={"tag1"}),  # running
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["toml", "sigyelog"])
+def test_aggregate(tmp_path, fmt):
+    repo = TimeEntryRepositoryFile(tmp_path / f"test.{fmt}")
+    repo.save_all(make_aggregation_entries())
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+
+    assert repo.aggregate(["project"], now=now) == [
+        EntryTotal(("abc",), timedelta(hours=4, minutes=30), 2),
+        EntryTotal(("def",), timedelta(hours=2, minutes=45), 2),
+    ]
+    assert repo.aggregate(["week"], now=now) == [
+        EntryTotal(("2020-12-28",), timedelta(hours=4, minutes=30), 2),
+        EntryTotal(("2021-01-04",), timedelta(minutes=45), 1),
+        EntryTotal(("2021-02-01",), timedelta(hours=2), 1),
+    ]
+    assert repo.aggregate(["month", "tag"], now=now) == [
+        EntryTotal(("2021-01", ""), timedelta(hours=2, minutes=15), 2),
+        EntryTotal(("2021-01", "tag1"), timedelta(hours=3), 1),
+        EntryTotal(("2021-01", "tag2"), timedelta(hours=3), 1),
+        EntryTotal(("2021-02", "tag1"), timedelta(hours=2), 1),
+    ]
+    assert repo.aggregate(["day"], filter=EntryListFilter(projects={"abc"}), now=now) == [
+        EntryTotal(("2021-01-01",), timedelta(hours=1, minutes=30), 1),
+        EntryTotal(("2021-01-03",), timedelta(hours=3), 1),
+    ]
+
+
+# paging filters over make_aggregation_entries and the totals of their pages (at 11:00 on 2021-02-01)
+PAGED_AGGREGATES = [
+    (EntryListFilter(last=1), [EntryTotal(("def",), timedelta(hours=2), 1)]),
+    (EntryListFilter(limit=2), [EntryTotal(("abc",), timedelta(hours=4, minutes=30), 2)]),
+    (EntryListFilter(limit=1, offset=2), [EntryTotal(("def",), timedelta(minutes=45), 1)]),
+]
+
+
+@pytest.mark.parametrize("rollups", [True, False])
+def test_aggregate_paged(tmp_path, rollups):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml", rollups=rollups)
+    repo.save_all(make_aggregation_entries())
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+    for filter, totals in PAGED_AGGREGATES:
+        assert repo.aggregate(["project"], filter=filter, now=now) == totals
+
+
+def make_prefix_entries() -> list[TimeEntry]:
+    return [
+        TimeEntry(project="abc", start_time="2021-01-01T09:00:00", end_time="2021-01-01T10:00:00"),
+        TimeEntry(project="abc-api", start_time="2021-01-01T10:00:00", end_time="2021-01-01T12:00:00"),
+        TimeEntry(project="abc-api-v2", start_time="2021-01-02T09:00:00", end_time="2021-01-02T09:30:00"),
+        TimeEntry(project="def-ui", start_time="2021-01-02T10:00:00", end_time="2021-01-02T11:00:00"),
+        TimeEntry(project="-", start_time="2021-01-02T11:00:00", end_time="2021-01-02T11:15:00"),
+    ]
+
+
+def test_aggregate_project_prefix(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(make_prefix_entries())
+    assert repo.aggregate(["project-prefix"]) == [
+        EntryTotal(("",), timedelta(minutes=15), 1),
+        EntryTotal(("abc",), timedelta(hours=3, minutes=30), 3),
+        EntryTotal(("def",), timedelta(hours=1), 1),
+    ]
+
+
+def make_search_entries() -> list[TimeEntry]:
+    return [
+        TimeEntry(project="abc", start_time="2021-01-01T09:00:00", comment="Fixed TICKET-123 in the parser"),
+        TimeEntry(project="def", start_time="2021-01-02T09:00:00", comment="reviewed the ticket queue"),
+        TimeEntry(project="abc", start_time="2021-01-03T09:00:00", comment="parsing tickets, again"),
+        TimeEntry(project="abc", start_time="2021-01-04T09:00:00"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "query,filter,expected",
+    [
+        ("ticket", None, [0, 1]),
+        ("TICKET the", None, [0, 1]),
+        ("tick*", None, [0, 1, 2]),
+        ("pars* tick*", None, [0, 2]),
+        ("ticket", EntryListFilter(projects={"abc"}), [0]),
+        ("tick*", EntryListFilter(start_date="2021-01-02"), [1, 2]),
+        ("123", None, [0]),
+        ("missing", None, []),
+        ("", None, []),
+    ],
+)
+def test_search(tmp_path, query, filter, expected):
+    entries = make_search_entries()
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    repo.save_all(entries)
+    assert repo.search(query, filter=filter) == [entries[n] for n in expected]
+
+
+def test_search_index_follows_changes(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    entry = TimeEntry(project="abc", start_time="2021-01-01T09:00:00", comment="first draft")
+    repo.save(entry)
+    assert repo.search("draft") == [entry]
+    entry.comment = "final version"
+    repo.save(entry)
+    assert repo.search("draft") == []
+    assert repo.search("final") == [entry]
+
+
+def test_without_sidecars(tmp_path):
+    filename = tmp_path / "test.toml"
+    repo = TimeEntryRepositoryFile(filename, sidecars=False)
+    active = TimeEntry(project="active", start_time="2021-01-02T00:00:00")
+    repo.save(active)
+    assert repo.get_active_entry() == active
+    assert TimeEntryRepositoryFile(filename, sidecars=False).get_all() == [active]
+    assert [p.name for p in tmp_path.iterdir()] == ["test.toml"]
+
+
+@pytest.mark.parametrize("fmt", ["toml", "sigyelog"])
+def test_transaction(tmp_path, fmt):
+    filename = tmp_path / f"test.{fmt}"
+    repo = TimeEntryRepositoryFile(filename)
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00")
+    entry2 = TimeEntry(project="test2", start_time="2021-01-02T00:00:00")
+    initial = filename.read_text()
+
+    with mock.patch.object(repo, "_save_data", wraps=repo._save_data) as save_data:
+        with repo.transaction():
+            repo.save(entry1)
+            with repo.transaction():
+                entry1.stop(end_time=entry2.start_time)
+                repo.save(entry1)
+                repo.save(entry2)
+            # nothing reaches the file until the transaction exits (another instance would block on the lock)
+            assert filename.read_text() == initial
+            assert repo.get_active_entry() == entry2
+        assert save_data.call_count == (0 if fmt == "sigyelog" else 1)
+    fresh = TimeEntryRepositoryFile(filename)
+    assert fresh.get_all() == [entry1, entry2]
+    assert fresh.get_active_entry() == entry2
+
+    # an exception discards every buffered change
+    with pytest.raises(RuntimeError), repo.transaction():
+        repo.delete_entry(entry1.id)
+        repo.save(TimeEntry(project="test3", start_time="2021-01-03T00:00:00"))
+        raise RuntimeError("abort")
+    assert repo.get_all() == [entry1, entry2]
+    assert repo.get_active_entry() == entry2
+    assert TimeEntryRepositoryFile(filename).get_all() == [entry1, entry2]
+
+
+@pytest.mark.parametrize("fmt", ["toml", "sigyelog"])
+def test_nested_transaction_rollback(tmp_path, fmt):
+    filename = tmp_path / f"test.{fmt}"
+    repo = TimeEntryRepositoryFile(filename)
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00")
+    entry2 = TimeEntry(project="test2", start_time="2021-01-02T00:00:00")
+
+    with repo.transaction():
+        repo.save(entry1)
+        # a failed inner transaction only discards its own changes
+        with pytest.raises(RuntimeError), repo.transaction():
+            repo.delete_entry(entry1.id)
+            repo.save(entry2)
+            raise RuntimeError("abort")
+        assert repo.get_all() == [entry1]
+        assert repo.get_active_entry() == entry1
+    fresh = TimeEntryRepositoryFile(filename)
+    assert fresh.get_all() == [entry1]
+    assert fresh.get_active_entry() == entry1
+
+
+def test_reload_after_write_by_another_instance(tmp_path):
+    filename = tmp_path / "test.toml"
+    reader = TimeEntryRepositoryFile(filename)
+    writer = TimeEntryRepositoryFile(filename)
+    assert reader.get_all() == []
+    assert reader.get_active_entry() is None
+
+    entry = TimeEntry(project="test", start_time="2021-01-01T00:00:00")
+    writer.save(entry)
+    assert reader.get_all() == [entry]
+    assert reader.get_active_entry() == entry
+    assert reader.get_entry_by_id(entry.id) == entry
+
+    # a write through the stale instance doesn't lose the other instance's entry
+    entry2 = TimeEntry(project="test2", start_time="2021-01-02T00:00:00")
+    writer.save(entry2)
+    entry3 = TimeEntry(project="test3", start_time="2021-01-03T00:00:00")
+    reader.save(entry3)
+    assert TimeEntryRepositoryFile(filename).get_all() == [entry, entry2, entry3]
+
+
+@pytest.mark.skipif(fcntl is None, reason="advisory locks need fcntl")
+def test_readers_share_the_lock(tmp_path):
+    filename = tmp_path / "test.toml"
+    repo = TimeEntryRepositoryFile(filename)
+    repo.save(TimeEntry(project="test", start_time="2021-01-01T00:00:00"))
+
+    with file_lock(repo.lock_filename):
+        # a second reader gets its shared lock while the first is still held
+        assert len(TimeEntryRepositoryFile(filename, parse_cache=False).get_all()) == 1
+        with open(repo.lock_filename) as f, pytest.raises(BlockingIOError):
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+@pytest.mark.parametrize("module", [toml, json])
+def test_unknown_stored_keys_are_ignored(tmp_path, module):
+    filename = tmp_path / f"test.{module.__name__[-4:]}"
+    entries = make_aggregation_entries()
+    TimeEntryRepositoryFile(filename).save_all(entries)
+    data = module.loads(filename.read_text())
+    for entry in data["entries"]:
+        entry["note"] = "from another version or a manual edit"
+    filename.write_text(module.dumps(data))
+
+    repo = TimeEntryRepositoryFile(filename)
+    assert {entry.id: entry for entry in repo.get_all()} == {entry.id: entry for entry in entries}
+    assert repo.get_active_entry() == entries[3]
+    assert [record.id for record in repo.iter_records()] == [entry.id for entry in repo.get_all()]
@@ -1,7 +1,23 @@
+import multiprocessing
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
 import pytest
+from peewee import SqliteDatabase
 
-from ...models import EntryListFilter, TimeEntry
-from ..time_entry_repo_orm import TimeEntryRepositoryORM
+from ...config.settings import SqliteSettings
+from ...models import EntryListFilter, EntryTotal, TimeEntry
+from ..time_entry_repo_file import TimeEntryRepositoryFile
+from ..time_entry_repo_orm import SCHEMA_VERSION, TimeEntryRepositoryORM
+from .test_repo_file import (
+    PAGED_AGGREGATES,
+    make_aggregation_entries,
+    make_paging_entries,
+    make_prefix_entries,
+    make_search_entries,
+)
 
 
 def test_entry_repo_orm_empty():
@@ -13,6 +29,7 @@ def test_entry_repo_orm_empty():
     with pytest.raises(KeyError):
         repo.get_entry_by_id("test")
     assert repo.filter() == []
+    assert repo.get_active_entry() is None
 
 
 def test_entry_repo_orm_standard():
@@ -20,6 +37,91 @@ def test_entry_repo_orm_standard():
     entry = TimeEntry(project="test", start_time="2021-01-01T00:00:00", tags=["tag1", "tag2"])
     repo.save(entry)
     assert repo.get_active_entry() == entry
+    assert {"time_entries_active", "time_entries_start_time", "time_entries_project"} <= {
+        index.name for index in repo.database.get_indexes("time_entries")
+    }
+
+
+def test_entry_repo_orm_migrates_unversioned_database(tmp_path):
+    filename = tmp_path / "old.db"
+    with sqlite3.connect(filename) as conn:  # the schema before it was versioned: no secondary indexes
+        conn.execute(
+            "CREATE TABLE time_entries (id VARCHAR(255) NOT NULL PRIMARY KEY, start_time DATETIME NOT NULL, "
+            "end_time DATETIME, project VARCHAR(255) NOT NULL, comment VARCHAR(255) NOT NULL, tags JSON NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO time_entries VALUES "
+            "('abc', '2021-01-01 00:00:00+00:00', NULL, 'test', 'before the upgrade', '[\"tag1\"]')"
+        )
+    conn.close()
+
+    repo = TimeEntryRepositoryORM(str(filename))
+    assert repo.get_active_entry().id == "abc"
+    assert [entry.id for entry in repo.filter(filter=EntryListFilter(tags={"tag1"}))] == ["abc"]
+    assert [entry.id for entry in repo.search("upgrade")] == ["abc"]
+    assert repo.rebuild_rollups() == (0, [])  # the running entry has no finished day to roll up
+    assert repo.database.pragma("user_version") == SCHEMA_VERSION
+    assert {"time_entries_active", "time_entries_start_time", "time_entries_project"} <= {
+        index.name for index in repo.database.get_indexes("time_entries")
+    }
+
+
+def test_entry_repo_orm_migrates_once(tmp_path):
+    filename = str(tmp_path / "test.db")
+    repo = TimeEntryRepositoryORM(filename)
+    repo.save(TimeEntry(project="test", start_time="2021-01-01T09:00:00", end_time="2021-01-01T10:00:00"))
+    repo.aggregate(["day"])
+    assert not repo.stale_rollup_model.select().exists()
+
+    pragma = SqliteDatabase.pragma
+
+    def outdated_first_read(database, key, *args, **kwargs):
+        # another process migrated the database between this one reading its version and migrating it
+        if key == "user_version" and not args and not reads:
+            reads.append(key)
+            return 0
+        return pragma(database, key, *args, **kwargs)
+
+    reads = []
+    with mock.patch.object(SqliteDatabase, "pragma", outdated_first_read):
+        repo = TimeEntryRepositoryORM(filename)
+    assert reads
+    assert not repo.stale_rollup_model.select().exists()  # the migration steps weren't run again
+
+
+def test_entry_repo_orm_switches_to_wal_while_written(tmp_path):
+    filename = str(tmp_path / "test.db")
+    conn = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+    conn.execute("CREATE TABLE other (x)")
+    conn.execute("BEGIN IMMEDIATE")  # another process is writing when the file is first opened in WAL mode
+    conn.execute("INSERT INTO other VALUES (1)")
+    writer = threading.Timer(0.2, conn.execute, ["COMMIT"])
+    writer.start()
+    repo = TimeEntryRepositoryORM(filename, pragmas={"journal_mode": "wal"})
+    writer.join()
+    conn.close()
+    assert repo.database.pragma("journal_mode") == "wal"
+
+
+def _open_repo(filename: str, barrier, errors) -> None:
+    barrier.wait()
+    try:
+        TimeEntryRepositoryORM(filename, pragmas=SqliteSettings().pragmas())
+    except Exception as e:
+        errors.put(repr(e))
+
+
+def test_entry_repo_orm_opened_by_processes_at_once(tmp_path):
+    for attempt in range(3):
+        filename = str(tmp_path / f"new{attempt}.db")
+        barrier, errors = multiprocessing.Barrier(8), multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_open_repo, args=(filename, barrier, errors)) for _ in range(8)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert errors.empty()
+        assert TimeEntryRepositoryORM(filename).database.pragma("user_version") == SCHEMA_VERSION
 
 
 def test_entry_repo_orm_filter():
@@ -53,6 +155,72 @@ def test_entry_repo_orm_filter():
     assert repo.filter(filter=filter5) == [entry1]
     filter6 = EntryListFilter(tags=["blah"])
     assert repo.filter(filter=filter6) == []
+    # entries with any of the tags, like the file repository
+    filter7 = EntryListFilter(tags=["tag1", "tag2"])
+    assert repo.filter(filter=filter7) == [entry1, entry2, entry3]
+    filter8 = EntryListFilter(tags=["tag3"], projects=["test3"])
+    assert repo.filter(filter=filter8) == [entry3]
+
+
+@pytest.mark.parametrize(
+    "projects",
+    [{"abc+"}, {"abc."}, {"abc*"}, {"abc-1"}, {"ab+", "def"}, {"abc-1+", "def"}, {"*"}, {"abd+"}, {"abc+", "abc-"}],
+)
+def test_entry_repo_orm_project_prefixes(tmp_path, projects):
+    entries = [
+        TimeEntry(project=project, start_time=f"2021-01-0{day}T00:00:00")
+        for day, project in enumerate(["abc", "abc-1", "abc-2", "abd", "def", "ab", "abc+"], start=1)
+    ]
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    file_repo.save_all(entries)
+    filter = EntryListFilter(projects=projects)
+    assert repo.filter(filter=filter) == file_repo.filter(filter=filter)
+
+
+def test_entry_repo_orm_tag_table():
+    def tag_rows():
+        return {(row.tag, row.entry_id) for row in repo.tag_model.select()}
+
+    repo = TimeEntryRepositoryORM(":memory:")
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00", tags=["tag1", "tag2"])
+    entry2 = TimeEntry(project="test", start_time="2021-01-02T00:00:00", tags=["tag2"])
+    repo.save_all([entry1, entry2])
+    assert tag_rows() == {("tag1", entry1.id), ("tag2", entry1.id), ("tag2", entry2.id)}
+
+    entry1.tags = {"tag3"}
+    repo.save(entry1)
+    assert tag_rows() == {("tag2", entry2.id), ("tag3", entry1.id)}
+    repo.delete_entry(entry2.id)
+    assert tag_rows() == {("tag3", entry1.id)}
+    assert repo.filter(filter=EntryListFilter(tags=["tag3"])) == [entry1]
+
+
+def test_entry_repo_orm_save_updates_existing_entry():
+    repo = TimeEntryRepositoryORM(":memory:")
+    entry = TimeEntry(project="test", start_time="2021-01-01T00:00:00", tags=["tag1"])
+    repo.save(entry)
+    entry.stop(end_time=entry.start_time.replace(hour=1))
+    entry.project = "renamed"
+    entry.comment = "done"
+    repo.save(entry)
+    assert repo.get_all() == [entry]
+    assert repo.get_active_entry() is None
+
+
+def test_entry_repo_orm_save_all_batches():
+    repo = TimeEntryRepositoryORM(":memory:")
+    entries = [TimeEntry(project="test", start_time=f"2021-01-01T00:{i // 60:02}:{i % 60:02}") for i in range(1000)]
+    with mock.patch.object(repo.database, "execute_sql", wraps=repo.database.execute_sql) as execute_sql:
+        repo.save_all(iter(entries))
+    assert len([call for call in execute_sql.call_args_list if "INSERT" in call.args[0]]) == 7
+    assert repo.get_all() == entries
+
+    # saving entries that already exist updates them instead of failing
+    entries[0].comment = "updated"
+    repo.save_all(entries[:2])
+    assert repo.get_all() == entries
 
 
 def test_entry_repo_orm_delete():
@@ -91,3 +259,229 @@ def test_entry_repo_orm_save_all():
     )
     repo.save_all([entry1, entry2])
     assert repo.get_all() == [entry1, entry2]
+
+
+def test_entry_repo_orm_partial_id():
+    repo = TimeEntryRepositoryORM(":memory:")
+    entry1 = TimeEntry(id="abc123", project="test", start_time="2021-01-02T00:00:00")
+    entry2 = TimeEntry(id="abc789", project="test", start_time="2021-01-01T00:00:00")
+    entry3 = TimeEntry(id="abd456", project="test", start_time="2021-01-03T00:00:00")
+    repo.save_all([entry1, entry2, entry3])
+    assert repo.get_entries_by_partial_id("abc") == [entry2, entry1]
+    assert repo.get_entries_by_partial_id("abd") == [entry3]
+    assert repo.get_entries_by_partial_id("abz") == []
+
+
+def test_entry_repo_orm_transaction():
+    repo = TimeEntryRepositoryORM(":memory:")
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00")
+    with repo.transaction():
+        repo.save(entry1)
+    assert repo.get_all() == [entry1]
+
+    with pytest.raises(RuntimeError), repo.transaction():
+        repo.save(TimeEntry(project="test2", start_time="2021-01-02T00:00:00"))
+        raise RuntimeError("abort")
+    assert repo.get_all() == [entry1]
+
+
+def test_entry_repo_orm_instances_are_independent(tmp_path):
+    repo1 = TimeEntryRepositoryORM(str(tmp_path / "one.db"))
+    repo2 = TimeEntryRepositoryORM(str(tmp_path / "two.db"))
+    entry1 = TimeEntry(project="test", start_time="2021-01-01T00:00:00", tags=["tag1"])
+    entry2 = TimeEntry(project="test2", start_time="2021-01-02T00:00:00", tags=["tag1"])
+    repo1.save(entry1)
+    repo2.save(entry2)
+    assert repo1.get_all() == [entry1]
+    assert repo2.filter(filter=EntryListFilter(tags={"tag1"})) == [entry2]
+
+    assert repo1.backup(tmp_path / "copy.db") == 1
+    assert TimeEntryRepositoryORM(str(tmp_path / "copy.db")).get_all() == [entry1]
+
+
+def test_entry_repo_orm_iter_filter():
+    repo = TimeEntryRepositoryORM(":memory:")
+    # several entries share a start time, so pages have to continue by id as well
+    entries = [
+        TimeEntry(id=f"{i:02}", project="test" if i % 2 else "other", start_time=f"2021-01-0{1 + i // 3}T00:00:00")
+        for i in range(10)
+    ]
+    repo.save_all(reversed(entries))
+    with mock.patch.object(repo.model, "select", wraps=repo.model.select) as select:
+        assert list(repo.iter_filter(batch_size=3)) == entries
+    assert select.call_count == 1  # one query, run once per page
+    assert list(repo.iter_filter(filter=EntryListFilter(projects={"test"}), batch_size=2)) == entries[1::2]
+    assert list(repo.iter_filter(filter=EntryListFilter(projects={"nothing"}))) == []
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [
+        EntryListFilter(limit=3, offset=2),
+        EntryListFilter(last=3),
+        EntryListFilter(last=3, offset=8),
+        EntryListFilter(after="04"),
+        EntryListFilter(projects={"test"}, after="03", limit=2),
+        EntryListFilter(start_date="2021-01-03", end_date="2021-01-06", last=2),
+    ],
+)
+def test_entry_repo_orm_paging(tmp_path, filter):
+    entries = make_paging_entries()
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    file_repo.save_all(entries)
+    assert repo.filter(filter=filter) == file_repo.filter(filter=filter)
+    assert list(repo.iter_filter(filter=filter)) == file_repo.filter(filter=filter)
+
+
+def test_entry_repo_orm_iter_records(tmp_path):
+    entries = make_aggregation_entries()
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    file_repo.save_all(entries)
+    assert list(repo.iter_records(batch_size=2)) == list(file_repo.iter_records())
+    filter = EntryListFilter(tags={"tag1"}, last=1)
+    assert list(repo.iter_records(filter=filter)) == list(file_repo.iter_records(filter=filter))
+
+
+def test_entry_repo_orm_paging_unknown_after():
+    repo = TimeEntryRepositoryORM(":memory:")
+    with pytest.raises(KeyError):
+        repo.filter(filter=EntryListFilter(after="unknown"))
+
+
+@pytest.mark.parametrize(
+    "group_by",
+    [["day"], ["week"], ["month"], ["project"], ["project-prefix"], ["tag"], ["month", "project", "tag"]]
+    + [["project-prefix", "day"]],
+)
+def test_entry_repo_orm_aggregate(tmp_path, group_by):
+    entries = make_aggregation_entries() + make_prefix_entries()
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    file_repo.save_all(entries)
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+    for filter in [None, EntryListFilter(tags={"tag1"}), EntryListFilter(start_date="2021-01-04")]:
+        assert repo.aggregate(group_by, filter=filter, now=now) == file_repo.aggregate(group_by, filter=filter, now=now)
+
+
+def test_entry_repo_orm_aggregate_paged():
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(make_aggregation_entries())
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+    for filter, totals in PAGED_AGGREGATES:
+        assert repo.aggregate(["project"], filter=filter, now=now) == totals
+
+
+@pytest.mark.parametrize("query", ["ticket", "TICKET the", "tick*", "pars* tick*", "123", "missing", "", '"quoted" OR'])
+def test_entry_repo_orm_search(tmp_path, query):
+    entries = make_search_entries()
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml")
+    file_repo.save_all(entries)
+    for filter in [None, EntryListFilter(projects={"abc"}), EntryListFilter(start_date="2021-01-02")]:
+        assert repo.search(query, filter=filter) == file_repo.search(query, filter=filter)
+
+
+def test_entry_repo_orm_search_follows_changes():
+    repo = TimeEntryRepositoryORM(":memory:")
+    entry = TimeEntry(project="abc", start_time="2021-01-01T09:00:00", comment="first draft")
+    repo.save(entry)
+    assert repo.search("draft") == [entry]
+    entry.comment = "final version"
+    repo.save(entry)
+    assert repo.search("draft") == []
+    assert repo.search("final") == [entry]
+    repo.delete_entry(entry.id)
+    assert repo.search("final") == []
+
+
+def test_entry_repo_orm_rollups_follow_changes(tmp_path):
+    entries = make_aggregation_entries() + make_prefix_entries()
+    repo = TimeEntryRepositoryORM(str(tmp_path / "test.db"))
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "test.toml", rollups=False)
+    file_repo.save_all(entries)
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+
+    def check():
+        for group_by in (["day", "project"], ["week", "tag"], []):
+            for filter in [None, EntryListFilter(projects={"abc+"}), EntryListFilter(start_date="2021-01-04")]:
+                assert repo.aggregate(group_by, filter=filter, now=now) == file_repo.aggregate(
+                    group_by, filter=filter, now=now
+                )
+        assert not repo.stale_rollup_model.select().exists()  # reading brought every day up to date
+
+    check()
+    assert repo.rollup_model.select().count() == 7
+    moved = entries[2].model_copy(update={"project": "ghi", "start_time": entries[2].start_time.replace(day=5)})
+    for changed in (repo, file_repo):
+        changed.save(moved)
+        changed.delete_entry(entries[0].id)
+        changed.save(entries[3].model_copy(update={"end_time": now}))  # the running entry stops
+    stale = {day for (day,) in repo.stale_rollup_model.select().tuples()}
+    assert stale == {"2021-01-01", "2021-01-04", "2021-01-05", "2021-02-01"}
+    check()
+    assert repo.rebuild_rollups() == (5, [])
+
+
+def test_entry_repo_orm_rebuild_rollups():
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(make_aggregation_entries())
+    assert repo.rebuild_rollups() == (3, [])
+    repo.rollup_model.update(seconds=1).where(repo.rollup_model.day == "2021-01-03").execute()
+    assert repo.aggregate(["day"])[1].duration == timedelta(seconds=1)  # kept as written
+    assert repo.rebuild_rollups() == (3, ["2021-01-03"])
+    assert repo.aggregate(["day"])[1].duration == timedelta(hours=3)
+
+
+def _report_repeatedly(filename: str, barrier, errors) -> None:
+    repo = TimeEntryRepositoryORM(filename, pragmas=SqliteSettings().pragmas())
+    barrier.wait()
+    for _ in range(20):
+        try:
+            repo.aggregate(["day", "project"])
+        except Exception as e:
+            errors.put(repr(e))
+
+
+def _save_repeatedly(filename: str, barrier, errors, project: str) -> None:
+    repo = TimeEntryRepositoryORM(filename, pragmas=SqliteSettings().pragmas())
+    barrier.wait()
+    start = datetime.fromisoformat("2021-01-01T09:00:00")
+    for n in range(20):
+        try:
+            day = start + timedelta(days=n)
+            repo.save(TimeEntry(project=project, start_time=day, end_time=day + timedelta(hours=1)))
+        except Exception as e:
+            errors.put(repr(e))
+
+
+def test_entry_repo_orm_reports_while_others_write(tmp_path):
+    filename = str(tmp_path / "test.db")
+    TimeEntryRepositoryORM(filename, pragmas=SqliteSettings().pragmas())
+    barrier, errors = multiprocessing.Barrier(8), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_report_repeatedly, args=(filename, barrier, errors)) for _ in range(4)]
+    processes += [
+        multiprocessing.Process(target=_save_repeatedly, args=(filename, barrier, errors, f"p{n}")) for n in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert errors.empty()
+    repo = TimeEntryRepositoryORM(filename)
+    assert repo.aggregate(["project"]) == [EntryTotal((f"p{n}",), timedelta(hours=20), 20) for n in range(4)]
+
+
+def test_entry_repo_orm_rollups_in_transaction():
+    repo = TimeEntryRepositoryORM(":memory:")
+    repo.save_all(make_aggregation_entries())
+    with repo.transaction():
+        repo.save(TimeEntry(project="ghi", start_time="2021-01-06T09:00:00", end_time="2021-01-06T10:00:00"))
+        assert repo.aggregate(["project"])[-1] == EntryTotal(("ghi",), timedelta(hours=1), 1)
+        assert repo.rebuild_rollups() == (4, [])
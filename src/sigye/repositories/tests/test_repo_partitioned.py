@@ -0,0 +1,246 @@
+import json
+from datetime import datetime
+from unittest import mock
+
+import pytest
+import rtoml as toml
+
+from ...models import EntryListFilter, TimeEntry
+from ..time_entry_repo_file import TimeEntryRepositoryFile
+from ..time_entry_repo_partitioned import TimeEntryRepositoryPartitioned
+from .test_repo_file import PAGED_AGGREGATES, make_aggregation_entries, make_paging_entries
+
+
+def make_entries() -> list[TimeEntry]:
+    return [
+        TimeEntry(project="test", start_time="2021-01-30T09:00:00", end_time="2021-01-30T10:00:00"),
+        TimeEntry(project="test2", start_time="2021-02-01T09:00:00", end_time="2021-02-01T10:00:00"),
+        TimeEntry(project="test", start_time="2021-03-01T09:00:00", end_time="2021-03-01T10:00:00"),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["toml", "yaml", "sigyelog"])
+def test_partitioned_repo(tmp_path, fmt):
+    filename = tmp_path / f"entries.{fmt}"
+    repo = TimeEntryRepositoryPartitioned(filename)
+    assert repo.get_all() == []
+    assert repo.get_active_entry() is None
+    with pytest.raises(KeyError):
+        repo.get_entry_by_id("1")
+
+    entries = make_entries()
+    for entry in entries:
+        repo.save(entry)
+    assert sorted(p.name for p in (tmp_path / "entries").glob(f"*.{fmt}")) == [
+        f"2021-01.{fmt}",
+        f"2021-02.{fmt}",
+        f"2021-03.{fmt}",
+    ]
+
+    repo = TimeEntryRepositoryPartitioned(filename)
+    assert repo.get_all() == entries
+    assert repo.get_by_project("test") == [entries[0], entries[2]]
+    assert repo.get_entry_by_id(entries[1].id) == entries[1]
+    assert repo.get_entries_by_partial_id(entries[2].id[:8]) == [entries[2]]
+    assert repo.filter(filter=EntryListFilter(projects={"test"})) == [entries[0], entries[2]]
+
+    repo.delete_entry(entries[1].id)
+    with pytest.raises(KeyError):
+        repo.delete_entry(entries[1].id)
+    assert TimeEntryRepositoryPartitioned(filename).get_all() == [entries[0], entries[2]]
+
+
+def test_partitioned_repo_reads_only_overlapping_shards(tmp_path):
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    entries = make_entries()
+    repo.save_all(entries)
+
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    with mock.patch.object(TimeEntryRepositoryFile, "_load_data", autospec=True) as load_data:
+        load_data.return_value = {"entries": [entries[1].model_dump(mode="json")]}
+        assert repo.filter(filter=EntryListFilter(start_date="2021-02-01", end_date="2021-02-28")) == [entries[1]]
+        assert [call.args[0].filename.name for call in load_data.call_args_list] == ["2021-02.toml"]
+
+
+def test_partitioned_repo_iter_filter(tmp_path):
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    entries = make_entries()
+    repo.save_all(entries)
+
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    assert list(repo.iter_filter()) == entries
+    assert list(repo.iter_filter(filter=EntryListFilter(projects={"test"}, start_date="2021-02-01"))) == [entries[2]]
+    assert repo.get_entry_by_id(entries[2].id) == entries[2]
+    assert [record.to_entry() for record in repo.iter_records()] == entries
+
+
+def test_partitioned_repo_paging(tmp_path):
+    # entries spread over three monthly shards
+    entries = [
+        entry.model_copy(update={"start_time": entry.start_time.replace(month=1 + n // 4)})
+        for n, entry in enumerate(make_paging_entries())
+    ]
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    repo.save_all(entries)
+
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    with mock.patch.object(TimeEntryRepositoryFile, "_load_data", autospec=True) as load_data:
+        load_data.return_value = {"entries": [entry.model_dump(mode="json") for entry in entries[8:]]}
+        assert repo.filter(filter=EntryListFilter(last=2)) == entries[8:]
+    assert [call.args[0].filename.name for call in load_data.call_args_list] == ["2021-03.toml"]
+
+    assert repo.filter(filter=EntryListFilter(last=3, offset=1)) == entries[6:9]
+    assert repo.filter(filter=EntryListFilter(limit=3, offset=2)) == entries[2:5]
+    assert repo.filter(filter=EntryListFilter(after="06", limit=3)) == entries[7:10]
+    assert list(repo.iter_filter(filter=EntryListFilter(projects={"test"}, last=3))) == [
+        entries[5],
+        entries[7],
+        entries[9],
+    ]
+
+
+def test_partitioned_repo_aggregate(tmp_path):
+    entries = make_aggregation_entries()
+    repo = TimeEntryRepositoryPartitioned(tmp_path / "entries.toml")
+    repo.save_all(entries)
+    file_repo = TimeEntryRepositoryFile(tmp_path / "single.toml")
+    file_repo.save_all(entries)
+    now = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+    for group_by in (["week"], ["project", "tag"]):
+        assert repo.aggregate(group_by, now=now) == file_repo.aggregate(group_by, now=now)
+    assert repo.rebuild_rollups() == (3, [])  # over the January and February shards
+    for filter, totals in PAGED_AGGREGATES:  # pages that span both shards
+        assert repo.aggregate(["project"], filter=filter, now=now) == totals
+
+
+def test_partitioned_repo_active_entry_and_moves(tmp_path):
+    filename = tmp_path / "entries.toml"
+    repo = TimeEntryRepositoryPartitioned(filename)
+    entries = make_entries()
+    repo.save_all(entries)
+
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+    repo.save(active)
+    assert repo.get_active_entry() == active
+    assert TimeEntryRepositoryPartitioned(filename).get_active_entry() == active
+
+    active.stop(end_time=active.start_time.replace(hour=10))
+    repo.save(active)
+    assert TimeEntryRepositoryPartitioned(filename).get_active_entry() is None
+
+    # moving an entry into another month relocates it to that month's shard
+    repo = TimeEntryRepositoryPartitioned(filename)
+    moved = repo.get_entry_by_id(entries[2].id)
+    moved.start_time = moved.start_time.replace(month=1, day=2)
+    moved.end_time = moved.end_time.replace(month=1, day=2)
+    repo.save(moved)
+    repo = TimeEntryRepositoryPartitioned(filename)
+    assert repo.get_all() == [moved, entries[0], entries[1], active]
+    assert repo.filter(filter=EntryListFilter(start_date="2021-03-01")) == [active]
+
+    repo.save_all([entries[0]])
+    assert TimeEntryRepositoryPartitioned(filename).get_all() == [entries[0]]
+
+
+def test_partitioned_repo_transaction(tmp_path):
+    filename = tmp_path / "entries.toml"
+    repo = TimeEntryRepositoryPartitioned(filename)
+    entries = make_entries()
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+
+    with repo.transaction():
+        for entry in entries:
+            repo.save(entry)
+        repo.save(active)
+        assert not (tmp_path / "entries" / "manifest.json").exists()
+        # nothing reaches the files until the transaction exits (another instance would block on the locks)
+        assert all(toml.load(shard) == {"entries": []} for shard in (tmp_path / "entries").glob("*.toml"))
+    fresh = TimeEntryRepositoryPartitioned(filename)
+    assert fresh.get_all() == entries + [active]
+    assert fresh.get_active_entry() == active
+
+    with pytest.raises(RuntimeError), repo.transaction():
+        active.stop(end_time=active.start_time.replace(hour=10))
+        repo.save(active)
+        repo.delete_entry(entries[0].id)
+        raise RuntimeError("abort")
+    assert repo.get_active_entry().end_time is None
+    assert TimeEntryRepositoryPartitioned(filename).get_all() == entries + [repo.get_active_entry()]
+
+
+def test_partitioned_repo_nested_transaction_rollback(tmp_path):
+    filename = tmp_path / "entries.toml"
+    repo = TimeEntryRepositoryPartitioned(filename)
+    entries = make_entries()
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+
+    with repo.transaction():
+        repo.save(entries[0])
+        with pytest.raises(RuntimeError), repo.transaction():
+            repo.delete_entry(entries[0].id)
+            repo.save(entries[1])
+            repo.save(active)
+            raise RuntimeError("abort")
+        assert repo.get_all() == [entries[0]]
+        assert repo.get_active_entry() is None
+        repo.save(entries[2])
+    fresh = TimeEntryRepositoryPartitioned(filename)
+    assert fresh.get_all() == [entries[0], entries[2]]
+    assert fresh.get_active_entry() is None
+
+
+def test_partitioned_repo_sees_other_instance_writes(tmp_path):
+    filename = tmp_path / "entries.toml"
+    first = TimeEntryRepositoryPartitioned(filename)
+    second = TimeEntryRepositoryPartitioned(filename)
+    assert first.get_active_entry() is None
+
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+    second.save(active)
+    assert first.get_active_entry() == active
+
+    # stopping through the first instance uses the manifest the second one wrote
+    active.stop(end_time=active.start_time.replace(hour=10))
+    first.save(active)
+    assert second.get_active_entry() is None
+
+
+def test_partitioned_repo_migrates_single_file(tmp_path):
+    filename = tmp_path / "entries.toml"
+    entries = make_entries()
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+    TimeEntryRepositoryFile(filename).save_all(entries + [active])
+
+    repo = TimeEntryRepositoryPartitioned(filename)
+    assert repo.get_all() == entries + [active]
+    assert repo.get_active_entry() == active
+    assert not filename.exists()
+    assert TimeEntryRepositoryFile(tmp_path / "entries.migrated.toml").get_all() == entries + [active]
+
+    # the shards are the store from now on, even if a single file shows up again
+    TimeEntryRepositoryFile(filename).save_all([])
+    assert TimeEntryRepositoryPartitioned(filename).get_all() == entries + [active]
+
+
+def test_partitioned_repo_stale_manifest(tmp_path):
+    filename = tmp_path / "entries.toml"
+    repo = TimeEntryRepositoryPartitioned(filename)
+    entries = make_entries()
+    active = TimeEntry(project="active", start_time="2021-03-02T09:00:00")
+    repo.save_all(entries + [active])
+    manifest = tmp_path / "entries" / "manifest.json"
+
+    # the pointed-at entry was deleted behind the repository's back
+    shard = TimeEntryRepositoryFile(tmp_path / "entries" / "2021-03.toml")
+    shard.delete_entry(active.id)
+    assert TimeEntryRepositoryPartitioned(filename).get_active_entry() is None
+    assert json.loads(manifest.read_text()) == {"active": None}
+
+    # or the pointer names a stopped entry, or a shard that doesn't exist
+    shard.save(active)
+    manifest.write_text(json.dumps({"active": {"id": entries[0].id, "shard": "2021-01"}}))
+    assert TimeEntryRepositoryPartitioned(filename).get_active_entry() == active
+    assert json.loads(manifest.read_text()) == {"active": {"id": active.id, "shard": "2021-03"}}
+    manifest.write_text(json.dumps({"active": {"id": active.id, "shard": "2020-12"}}))
+    assert TimeEntryRepositoryPartitioned(filename).get_active_entry() == active
+    assert not (tmp_path / "entries" / "2020-12.toml").exists()
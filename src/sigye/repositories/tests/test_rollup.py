@@ -0,0 +1,118 @@
+import pickle
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from ...models import EntryListFilter, TimeEntry
+from ..aggregation import Totals
+from ..rollup import DailyRollups
+from ..time_entry_repo_file import TimeEntryRepositoryFile
+from .test_repo_file import make_aggregation_entries, make_prefix_entries
+
+NOW = datetime.fromisoformat("2021-02-01T11:00:00+00:00")
+FILTERS = [
+    None,
+    EntryListFilter(tags={"tag1"}),
+    EntryListFilter(projects={"abc+"}),
+    EntryListFilter(start_date="2021-01-04", end_date="2021-01-31"),
+]
+
+
+def stored(entries: list[TimeEntry]) -> list[dict]:
+    return sorted((entry.model_dump(mode="json") for entry in entries), key=lambda entry: entry["start_time"])
+
+
+@pytest.mark.parametrize("group_by", [[], ["day"], ["week", "project"], ["month", "tag"], ["project-prefix", "tag"]])
+def test_daily_rollups_totals(tmp_path, group_by):
+    entries = make_aggregation_entries() + make_prefix_entries()
+    rollups = DailyRollups.from_entries(stored(entries))
+    assert sorted(rollups.days) == ["2021-01-01", "2021-01-02", "2021-01-03", "2021-01-04"]
+    assert [entry["project"] for entry in rollups.running] == ["def"]
+
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml", rollups=False)
+    repo.save_all(entries)
+    for filter in FILTERS:
+        totals = Totals(group_by, NOW)
+        rollups.add_to(totals, filter)
+        assert totals.result() == repo.aggregate(group_by, filter=filter, now=NOW)
+
+
+def test_daily_rollups_replace_days():
+    entries = stored(make_aggregation_entries())
+    rollups = DailyRollups.from_entries(entries)
+    changed = [*entries[:2], {**entries[2], "project": "ghi"}, {**entries[3], "end_time": "2021-02-01T10:00:00+00:00"}]
+    expected = DailyRollups.from_entries(changed)
+    assert expected.outdated_days(rollups) == ["2021-01-04", "2021-02-01"]
+
+    rollups.replace_days({"2021-01-04", "2021-02-01"}, changed)
+    assert rollups.days == expected.days
+    assert rollups.running == []
+    assert expected.outdated_days(rollups) == []
+
+
+def test_file_rollups_kept_and_updated_incrementally(tmp_path):
+    filename = tmp_path / "test.toml"
+    entries = make_aggregation_entries()
+    repo = TimeEntryRepositoryFile(filename)
+    repo.save_all(entries)
+    other = TimeEntryRepositoryFile(filename)
+    assert other.aggregate(["day"], now=NOW) == repo.aggregate(["day"], now=NOW)
+
+    entry = entries[2].model_copy(update={"project": "ghi"})
+    with mock.patch.object(DailyRollups, "from_entries", side_effect=AssertionError("rollups rebuilt")):
+        repo.save(entry)
+        repo.delete_entry(entries[0].id)
+        # another instance picks up the rollups written along with the data file
+        assert other.aggregate(["project"], now=NOW) == repo.aggregate(["project"], now=NOW)
+        with repo.transaction():
+            repo.save(entries[0])
+            assert repo.aggregate(["day"], now=NOW)[0].key == ("2021-01-01",)
+        assert other.aggregate(["day"], now=NOW)[0].key == ("2021-01-01",)
+
+    raw = TimeEntryRepositoryFile(filename, rollups=False)
+    for group_by in (["day", "project"], ["tag"]):
+        for filter in FILTERS:
+            assert other.aggregate(group_by, filter=filter, now=NOW) == raw.aggregate(group_by, filter=filter, now=NOW)
+    assert repo.rebuild_rollups().outdated == []
+
+
+def test_file_rollups_rollback(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.yaml")
+    repo.save_all(make_aggregation_entries())
+    expected = repo.aggregate(["day"], now=NOW)
+    with pytest.raises(RuntimeError), repo.transaction():
+        repo.save(TimeEntry(project="ghi", start_time="2021-01-06T09:00:00", end_time="2021-01-06T10:00:00"))
+        assert len(repo.aggregate(["day"], now=NOW)) == len(expected) + 1
+        raise RuntimeError
+    assert repo.aggregate(["day"], now=NOW) == expected
+
+
+def test_file_rollups_rebuild(tmp_path):
+    filename = tmp_path / "test.json"
+    repo = TimeEntryRepositoryFile(filename)
+    repo.save_all(make_aggregation_entries())
+    assert repo.rebuild_rollups().outdated == []  # nothing kept yet: there is nothing to compare
+
+    repo.aggregate(["day"])
+    assert repo.rebuild_rollups() == (3, [])  # the running entry's day has no finished entries
+
+    with open(repo.rollup_filename, "rb") as f:
+        snapshot = pickle.load(f)
+    snapshot["days"]["2021-01-04"] = {("abc", ()): [1, 1]}
+    with open(repo.rollup_filename, "wb") as f:
+        pickle.dump(snapshot, f)
+    other = TimeEntryRepositoryFile(filename)
+    assert other.aggregate(["day"], now=NOW)[2].duration == timedelta(microseconds=1)  # kept as written
+    assert other.rebuild_rollups() == (3, ["2021-01-04"])
+    assert other.aggregate(["day"], now=NOW) == TimeEntryRepositoryFile(filename, rollups=False).aggregate(
+        ["day"], now=NOW
+    )
+
+
+def test_file_rollups_without_sidecars(tmp_path):
+    repo = TimeEntryRepositoryFile(tmp_path / "test.toml", sidecars=False)
+    repo.save_all(make_aggregation_entries())
+    assert len(repo.aggregate(["day"], now=NOW)) == 4
+    assert repo.rebuild_rollups() == (0, [])
+    assert not (tmp_path / "test.toml.rollup").exists()
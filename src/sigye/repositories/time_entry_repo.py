@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from datetime import datetime
 
-from ..models import EntryListFilter, TimeEntry
+from ..models import EntryListFilter, EntryRecord, EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from .aggregation import Totals
+from .search import matches, parse_query, tokenize
 
 
 class TimeEntryRepository(ABC):
@@ -24,14 +29,67 @@ class TimeEntryRepository(ABC):
     def filter(self, *, filter: EntryListFilter) -> list[TimeEntry]:
         pass
 
+    def iter_filter(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[TimeEntry]:
+        """Yield the entries matching filter (all of them without one) in start time order
+
+        Repositories that can stream hold at most about ``batch_size`` entries in memory at a time.
+        """
+        yield from self.get_all() if filter is None else self.filter(filter=filter)
+
+    def iter_records(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[EntryRecord]:
+        """Like iter_filter, but yield compact read-only records for reports, exports and output"""
+        return map(EntryRecord.from_entry, self.iter_filter(filter=filter, batch_size=batch_size))
+
+    def aggregate(
+        self, group_by: Sequence[GroupBy], *, filter: EntryListFilter | None = None, now: datetime | None = None
+    ) -> list[EntryTotal]:
+        """Total duration and number of the entries matching filter per group key, ordered by key
+
+        A running entry counts up to now (the current time by default).
+        """
+        totals = Totals(group_by, now)
+        for entry in self.iter_filter(filter=filter):
+            totals.add(entry.start_time, entry.end_time, entry.project, entry.tags)
+        return totals.result()
+
+    def rebuild_rollups(self) -> RollupRebuild:
+        """Recompute the daily rollups reports read from the entries, checking the kept ones against them
+
+        Repositories that total the entries directly keep no rollups.
+        """
+        return RollupRebuild(0, [])
+
+    def search(self, query: str, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        """Entries matching filter whose comment contains every word of query, in start time order
+
+        Matching ignores case and a word ending in ``*`` matches as a prefix (``tick*`` finds "ticket").
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+        return [entry for entry in self.iter_filter(filter=filter) if matches(terms, tokenize(entry.comment))]
+
     @abstractmethod
     def get_entry_by_id(self) -> TimeEntry:
         pass
 
+    def get_entries_by_partial_id(self, partial_id: str) -> list[TimeEntry]:
+        return self.filter(filter=EntryListFilter(id=partial_id))
+
     @abstractmethod
     def delete_entry(self, id: str) -> TimeEntry:
         pass
 
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Group several mutations so they are persisted together
+
+        Repositories that can't batch writes persist each mutation as it happens. Transactions nest: if
+        an inner one raises, its changes are rolled back (like a savepoint) and the outer one carries on
+        when the exception is handled.
+        """
+        yield
+
     @abstractmethod
     def save_all(self, entries: list[TimeEntry]) -> None:
         pass
@@ -1,17 +1,31 @@
 import json
 import os
-from typing import TextIO
+import pickle
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from itertools import pairwise
+from typing import BinaryIO, TextIO
 
 import rtoml as toml
 import ryaml
 
-from ..models import EntryListFilter, TimeEntry
+from ..models import EntryListFilter, EntryRecord, EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from ..utils.file_utils import atomic_open, file_lock
+from .aggregation import Totals
+from .predicate import compile_filter
+from .rollup import DailyRollups
+from .search import SearchIndex, parse_query
 from .time_entry_repo import TimeEntryRepository
 
 
 class StorageFormat:
     """Base class for file formats used in storage"""
 
+    # formats that can persist a single mutation without rewriting the whole file
+    appendable = False
+
     def __init__(self, extension: str):
         self.extension = extension
 
@@ -62,12 +76,77 @@ class JSONFormat(StorageFormat):
         json.dump(data, f)
 
 
+class JournalFormat(StorageFormat):
+    """Append-only journal format (one JSON record per line)
+
+    A compacted journal starts with a ``snapshot`` record holding every entry. Each save or delete
+    appends a small ``save``/``delete`` record and loading replays them in order.
+    """
+
+    appendable = True
+
+    def __init__(self):
+        super().__init__("sigyelog")
+        self.pending_records = 0  # records appended since the last snapshot
+
+    def load_data(self, f: TextIO) -> dict:
+        entries = {}
+        self.pending_records = 0
+        lines = f.read().splitlines()
+        for n, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if n == len(lines):
+                    break  # a torn trailing record from an interrupted append
+                raise
+            match record["op"]:
+                case "snapshot":
+                    entries = {e["id"]: e for e in record["entries"]}
+                    self.pending_records = 0
+                    continue
+                case "save":
+                    entries[record["entry"]["id"]] = record["entry"]
+                case "delete":
+                    entries.pop(record["id"], None)
+            self.pending_records += 1
+        return {"entries": sorted(entries.values(), key=lambda x: x["start_time"])}
+
+    def save_data(self, data: dict, f: TextIO):
+        f.write(json.dumps({"op": "snapshot", "entries": data["entries"]}) + "\n")
+        self.pending_records = 0
+
+    @staticmethod
+    def truncate_torn_record(f: BinaryIO):
+        """Cut off a partially written trailing record so the next append starts on a fresh line"""
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            size = min(4096, position)
+            f.seek(position - size)
+            block = f.read(size)
+            if position == end and block.endswith(b"\n"):
+                return
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                f.truncate(position - size + newline + 1)
+                return
+            position -= size
+        f.truncate(0)
+
+    def append_record(self, record: dict, f: TextIO):
+        f.write(json.dumps(record) + "\n")
+        self.pending_records += 1
+
+
 class FormatFactory:
     _formats = {
         "yaml": YAMLFormat,
         "yml": YAMLFormat,
         "toml": TOMLFormat,
         "json": JSONFormat,
+        "sigyelog": JournalFormat,
     }
 
     @classmethod
@@ -87,114 +166,557 @@ class FormatFactory:
         return list(cls._formats.keys())
 
 
+PARSE_CACHE_VERSION = 1
+ROLLUP_VERSION = 1
+
+
+def _start_date_key(entry: dict) -> str:
+    return entry["start_time"][:10]
+
+
 class TimeEntryRepositoryFile(TimeEntryRepository):
-    def __init__(self, filename: str = "timesheet.yaml"):
+    """Entries stored in a single TOML, YAML, JSON or journal file
+
+    Writes replace the file atomically (or append to a journal) under an exclusive advisory lock on
+    ``<filename>.lock`` while reads take a shared one, so several sigye processes can use the same
+    file. Cached data is reloaded whenever another process has written the file since it was read.
+    Reports are answered from daily rollups kept in ``<filename>.rollup``, which every write brings up
+    to date for just the days it touched. With ``sidecars=False`` none of the ``.cache``, ``.active``,
+    ``.rollup`` or ``.lock`` files are written, for one-off files such as exports.
+    """
+
+    def __init__(
+        self,
+        filename: str = "timesheet.yaml",
+        compaction_threshold: int = 1000,
+        parse_cache: bool = True,
+        fsync: bool = False,
+        sidecars: bool = True,
+        rollups: bool = True,
+    ):
         self.filename = filename
+        self.sidecars = sidecars
+        self.compaction_threshold = compaction_threshold
+        self.fsync = fsync
         self._format = FormatFactory.get_format_from_filename(filename)
+        # a journal changes on every write, so a snapshot of it would be rewritten every time too
+        self.parse_cache = parse_cache and sidecars and not self._format.appendable
+        self.rollups = rollups and sidecars
         self._cache = None
+        self._signature = None  # data file signature the cached data and active entry belong to
+        self._ids = None  # entry id -> position in the cached entries
+        self._sorted_ids = None
+        self._search_index = None  # comment words of the cached entries, built on the first search
+        self._active = None  # stored dict of the active entry, once self._active_known
+        self._active_known = False
+        self._rollups = None  # daily rollups of the cached entries, except for self._stale_days
+        self._rollups_signature = None  # data file signature self._rollups were read or written at
+        self._stale_days: set[str] = set()  # days changed since the rollups were last brought up to date
+        self._changed_days: set[str] = set()  # days changed since the data file was last written
+        self._pending = []  # journal records (None for a full rewrite) not yet written
+        self._transaction_depth = 0
+        self._lock_exclusive = None  # mode of the lock currently held, None when unlocked
         self._ensure_file_exists()
 
+    @property
+    def parse_cache_filename(self) -> str:
+        return f"{self.filename}.cache"
+
+    @property
+    def active_pointer_filename(self) -> str:
+        return f"{self.filename}.active"
+
+    @property
+    def rollup_filename(self) -> str:
+        return f"{self.filename}.rollup"
+
+    @property
+    def lock_filename(self) -> str:
+        return f"{self.filename}.lock"
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False) -> Iterator[None]:
+        """Hold the advisory lock for the block (re-entrant)"""
+        if self._lock_exclusive is not None:
+            if exclusive and not self._lock_exclusive:
+                raise RuntimeError("cannot upgrade a shared lock to an exclusive lock")
+            yield
+            return
+        with file_lock(self.lock_filename, exclusive=exclusive) if self.sidecars else nullcontext():
+            self._lock_exclusive = exclusive
+            try:
+                yield
+            finally:
+                self._lock_exclusive = None
+
     def _ensure_file_exists(self):
         if not os.path.exists(self.filename):
-            self._save_data({"entries": []})
+            with self._locked(exclusive=True):
+                if not os.path.exists(self.filename):
+                    self._save_data({"entries": []})
+
+    def _file_signature(self) -> tuple[int, int]:
+        stat = os.stat(self.filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh_if_changed(self):
+        """Drop cached state when another process has written the data file since it was read"""
+        if self._signature is not None and not self._pending and self._file_signature() != self._signature:
+            self._invalidate_cache()
+
+    def _read_parse_cache(self, signature: tuple[int, int]) -> dict | None:
+        """Return the parsed data from the binary snapshot if it matches the data file"""
+        try:
+            with open(self.parse_cache_filename, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return None  # a missing or unreadable snapshot is simply rebuilt
+        if snapshot.get("version") != PARSE_CACHE_VERSION or snapshot.get("signature") != signature:
+            return None
+        return snapshot["data"]
+
+    def _write_parse_cache(self, data: dict) -> None:
+        snapshot = {"version": PARSE_CACHE_VERSION, "signature": self._file_signature(), "data": data}
+        try:
+            with atomic_open(self.parse_cache_filename, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # the snapshot is only an optimization
+
+    def _read_rollups(self, signature: tuple[int, int] | None) -> DailyRollups | None:
+        """Return the kept rollups if they were written for the data file at signature"""
+        try:
+            with open(self.rollup_filename, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return None  # missing or unreadable rollups are simply rebuilt
+        if snapshot.get("version") != ROLLUP_VERSION or snapshot.get("signature") != signature:
+            return None
+        rollups = DailyRollups()
+        rollups.days, rollups.running = snapshot["days"], snapshot["running"]
+        self._rollups_signature = signature
+        return rollups
+
+    def _write_rollups(self, rollups: DailyRollups | None) -> None:
+        if rollups is None:
+            return
+        self._rollups_signature = self._file_signature()
+        snapshot = {
+            "version": ROLLUP_VERSION,
+            "signature": self._rollups_signature,
+            "days": rollups.days,
+            "running": rollups.running,
+        }
+        try:
+            with atomic_open(self.rollup_filename, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # reports fall back to rebuilding them
+
+    def _mark_stale(self, *entries: dict) -> None:
+        if self.rollups:
+            days = {_start_date_key(entry) for entry in entries}
+            self._stale_days |= days
+            self._changed_days |= days
+
+    def _entries_on(self, days: set[str]) -> Iterator[dict]:
+        entries = self._load_data()["entries"]
+        for day in sorted(days):
+            lo, hi = self._date_window(entries, date.fromisoformat(day), date.fromisoformat(day))
+            yield from entries[lo:hi]
+
+    def _update_rollups(self) -> DailyRollups | None:
+        """Recompute the stale days of the loaded rollups from the cached entries"""
+        if self._stale_days:
+            days, self._stale_days = self._stale_days, set()
+            self._rollups.replace_days(days, self._entries_on(days))
+        return self._rollups
+
+    def _kept_rollups(self) -> DailyRollups | None:
+        """The kept rollups brought up to date with the cached entries, or None when none are kept
+
+        With changes pending the data file is still as it was loaded, and so are the kept rollups.
+        """
+        if not self.rollups:
+            return None
+        if self._pending:
+            signature = self._signature
+        else:
+            self._refresh_if_changed()
+            signature = self._file_signature()
+            if self._rollups is not None and self._rollups_signature != signature:
+                self._rollups = None  # another process wrote the data file
+        if self._rollups is None:
+            self._rollups = self._read_rollups(signature)
+            self._stale_days = set(self._changed_days)
+        if self._rollups is None:
+            return None
+        return self._update_rollups()
+
+    def _build_rollups(self) -> DailyRollups:
+        self._rollups = DailyRollups.from_entries(self._load_data()["entries"])
+        self._rollups_signature = None
+        self._stale_days = set()
+        if not self._pending:
+            self._write_rollups(self._rollups)
+        return self._rollups
+
+    def _load_rollups(self) -> DailyRollups:
+        """The kept rollups, or new ones built from the entries (and kept) when there are none"""
+        with self._locked():
+            return self._kept_rollups() or self._build_rollups()
+
+    def rebuild_rollups(self) -> RollupRebuild:
+        if not self.rollups:
+            return RollupRebuild(0, [])
+        with self._locked(exclusive=True):
+            kept = self._kept_rollups()
+            rollups = self._build_rollups()
+        return RollupRebuild(len(rollups.days), [] if kept is None else rollups.outdated_days(kept))
+
+    def _read_active_pointer(self) -> dict | None:
+        """Return the sidecar pointer to the active entry if it was written for the current data file"""
+        if not self.sidecars:
+            return None
+        try:
+            with open(self.active_pointer_filename) as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if pointer.get("signature") != list(self._file_signature()):
+            return None
+        return pointer
+
+    def _write_active_pointer(self) -> None:
+        if not self.sidecars:
+            return
+        pointer = {"signature": self._file_signature(), "entry": self._active}
+        try:
+            with atomic_open(self.active_pointer_filename) as f:
+                json.dump(pointer, f)
+        except OSError:
+            pass  # readers fall back to scanning the entries
+
+    def _load_active(self) -> dict | None:
+        """Stored dict of the active entry, answered by the sidecar pointer without loading the entries"""
+        self._refresh_if_changed()
+        if not self._active_known:
+            with self._locked():
+                pointer = self._read_active_pointer()
+                if pointer is None:
+                    self._active = next((e for e in self._load_data()["entries"] if not e.get("end_time")), None)
+                    self._write_active_pointer()
+                else:
+                    self._active = pointer["entry"]
+                    self._signature = tuple(pointer["signature"])
+                self._active_known = True
+        return self._active
+
+    def _set_cache(self, data: dict | None):
+        self._cache = data
+        self._ids = self._sorted_ids = None
+        self._search_index = None
 
     def _load_data(self) -> dict:
+        self._refresh_if_changed()
         if self._cache is None:
-            with open(self.filename) as f:
-                self._cache = self._format.load_data(f)
+            with self._locked():
+                signature = self._file_signature()
+                data = self._read_parse_cache(signature) if self.parse_cache else None
+                if data is None:
+                    with open(self.filename) as f:
+                        data = self._format.load_data(f)
+                    self._ensure_sorted(data["entries"])
+                    if self.parse_cache:
+                        self._write_parse_cache(data)
+            if signature != self._signature:
+                self._active_known = False
+            self._signature = signature
+            self._set_cache(data)
         return self._cache
 
     def _save_data(self, data: dict):
-        with open(self.filename, "w") as f:
+        with atomic_open(self.filename, fsync=self.fsync) as f:
             self._format.save_data(data, f)
-        self._cache = data
+        self._signature = self._file_signature()
+        if self.parse_cache:
+            self._write_parse_cache(data)
+        self._set_cache(data)
+        self._active = next((e for e in data["entries"] if not e.get("end_time")), None)
+        self._active_known = True
+        self._write_active_pointer()
+
+    @staticmethod
+    def _ensure_sorted(entries: list[dict]):
+        """Entries are kept sorted by start_time, but a hand-edited file may not be"""
+        if not all(a["start_time"] <= b["start_time"] for a, b in pairwise(entries)):
+            entries.sort(key=lambda x: x["start_time"])
+
+    @staticmethod
+    def _date_window(entries: list[dict], start_date: date | None, end_date: date | None) -> tuple[int, int]:
+        """Bisect the sorted entries for the slice starting within [start_date, end_date]
+
+        The first ten characters of an ISO start time are the entry's local date, which is what the
+        date filters compare against, and they sort the same way as the full timestamps.
+        """
+        lo = bisect_left(entries, start_date.isoformat(), key=_start_date_key) if start_date else 0
+        hi = bisect_right(entries, end_date.isoformat(), key=_start_date_key) if end_date else len(entries)
+        return lo, max(lo, hi)
+
+    def _id_index(self) -> dict[str, int]:
+        """Map of entry id to position in the cached entries, built once per load"""
+        entries = self._load_data()["entries"]
+        if self._ids is None:
+            self._ids = {entry["id"]: n for n, entry in enumerate(entries)}
+            self._sorted_ids = sorted(self._ids)
+        return self._ids
+
+    def _commit(self, data: dict, record: dict | None, active: dict | None):
+        """Apply a mutation to the cached data and persist it unless a transaction is open
+
+        ``record`` is the journal record describing the mutation, or None when it needs a full rewrite.
+        """
+        self._set_cache(data)
+        self._active = active
+        self._active_known = True
+        self._pending.append(record)
+        if not self._transaction_depth:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        rollups = self._kept_rollups()  # while the kept rollups still match the data file
+        records, self._pending = self._pending, []
+        self._changed_days = set()
+        if not self._format.appendable or None in records:
+            self._save_data(self._cache)
+            self._write_rollups(rollups)
+            return
+        with open(self.filename, "r+b") as f:
+            self._format.truncate_torn_record(f)
+        with open(self.filename, "a") as f:
+            for record in records:
+                self._format.append_record(record, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._signature = self._file_signature()
+        self._write_active_pointer()
+        self._write_rollups(rollups)
+        if self._format.pending_records > self.compaction_threshold:
+            self.compact()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Buffer mutations and write them once when the outermost transaction exits
+
+        The exclusive lock is held for the whole transaction, so nothing else writes in between. A
+        nested transaction that raises is rolled back to where it started, like a savepoint.
+        """
+        with self._locked(exclusive=True):
+            savepoint = self._savepoint() if self._transaction_depth else None
+            self._transaction_depth += 1
+            try:
+                yield
+            except BaseException:
+                if savepoint is None:
+                    self._pending = []
+                    self._invalidate_cache()  # drop the unwritten changes
+                else:
+                    self._rollback(savepoint)
+                raise
+            finally:
+                self._transaction_depth -= 1
+            if not self._transaction_depth:
+                self._flush()
+
+    def _savepoint(self) -> tuple:
+        # mutations replace entry dicts rather than changing them, so a copy of the list is enough
+        data = None if self._cache is None else {**self._cache, "entries": list(self._cache["entries"])}
+        return data, len(self._pending), self._active, self._active_known
+
+    def _rollback(self, savepoint: tuple):
+        data, pending, self._active, self._active_known = savepoint
+        self._set_cache(data)
+        del self._pending[pending:]
+        self._stale_days |= self._changed_days  # the rolled back changes are among them
 
     def _invalidate_cache(self):
-        self._cache = None
+        self._set_cache(None)
+        self._signature = None
+        self._active_known = False
+        self._rollups = None
+        self._stale_days, self._changed_days = set(), set()
+
+    def compact(self) -> None:
+        """Rewrite the data file as a single snapshot (only meaningful for journal storage)"""
+        with self._locked(exclusive=True):
+            self._commit(self._load_data(), None, self._load_active())
 
     def get_active_entry(self) -> TimeEntry | None:
-        data = self._load_data()
-        active = next((e for e in data["entries"] if not e.get("end_time")), None)
-        return TimeEntry(**active) if active else None
+        active = self._load_active()
+        return TimeEntry.from_storage(**active) if active else None
 
     def get_all(self) -> list[TimeEntry]:
         data = self._load_data()
         # Since entries are maintained in sorted order during save operations,
         # we don't need to sort here anymore
-        return [TimeEntry(**entry) for entry in data["entries"]]
+        return [TimeEntry.from_storage(**entry) for entry in data["entries"]]
 
     def get_by_project(self, project: str) -> list[TimeEntry]:
         data = self._load_data()
-        return [TimeEntry(**entry) for entry in data["entries"] if entry["project"] == project]
+        return [TimeEntry.from_storage(**entry) for entry in data["entries"] if entry["project"] == project]
 
     def get_entry_by_id(self, id: str) -> TimeEntry:
-        data = self._load_data()
-        for entry in data["entries"]:
-            if entry["id"] == id:
-                return TimeEntry(**entry)
-        raise KeyError("record id not found")
-
-    def delete_entry(self, id: str) -> TimeEntry:
-        data = self._load_data()
-        entries = []
-        found = None
-        for entry in data["entries"]:
-            if entry["id"] == id:
-                found = entry
-            else:
-                entries.append(entry)
-        if not found:
+        position = self._id_index().get(id)
+        if position is None:
             raise KeyError("record id not found")
-        self._save_data({"entries": entries})
-        return TimeEntry(**found)
+        return TimeEntry.from_storage(**self._load_data()["entries"][position])
+
+    def get_entries_by_partial_id(self, partial_id: str) -> list[TimeEntry]:
+        ids = self._id_index()
+        entries = self._load_data()["entries"]
+        positions = []
+        for n in range(bisect_left(self._sorted_ids, partial_id), len(self._sorted_ids)):
+            if not self._sorted_ids[n].startswith(partial_id):
+                break
+            positions.append(ids[self._sorted_ids[n]])
+        return [TimeEntry.from_storage(**entries[position]) for position in sorted(positions)]
+
+    def search(self, query: str, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        """Look the words up in an inverted index of the comments, built once per load"""
+        ids = self._id_index()
+        entries = self._load_data()["entries"]
+        if self._search_index is None:
+            self._search_index = SearchIndex((entry["id"], entry.get("comment", "")) for entry in entries)
+        positions = sorted(ids[id] for id in self._search_index.search(parse_query(query)))
+        if filter is not None:
+            lo, hi = self._date_window(entries, filter.start_date, filter.end_date)
+            matching = compile_filter(filter, dates=False)
+            positions = [n for n in positions if lo <= n < hi and matching(entries[n])]
+        return [TimeEntry.from_storage(**entries[n]) for n in positions]
 
-    @staticmethod
-    def _project_matching(filter_projects: set[str], project: str) -> bool:
-        for f_proj in filter_projects:
-            if (f_proj[-1] in "*+." and project.startswith(f_proj[0:-1])) or f_proj == project:
-                return True
-        return False
-
-    def _check_against_filter(self, filter: EntryListFilter, entry: TimeEntry) -> bool:
-        conditions = [
-            # id filter
-            (not filter.id or entry.id.startswith(filter.id)),
-            # Project filters
-            (not filter.projects or self._project_matching(filter.projects, entry.project)),
-            # Date filters
-            (not filter.start_date or entry.start_time.date() >= filter.start_date),
-            (not filter.end_date or (entry.start_time.date() <= filter.end_date)),
-            # Tag filter
-            (not filter.tags or any(tag in entry.tags for tag in filter.tags)),
-        ]
-        return all(conditions)
+    def delete_entry(self, id: str) -> TimeEntry:
+        with self._locked(exclusive=True):
+            active = self._load_active()
+            data = self._load_data()
+            position = self._id_index().get(id)
+            if position is None:
+                raise KeyError("record id not found")
+            found = data["entries"].pop(position)
+            self._mark_stale(found)
+            self._commit(data, {"op": "delete", "id": id}, None if active and active["id"] == id else active)
+        return TimeEntry.from_storage(**found)
 
     def filter(self, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
-        time_entries = self.get_all()
         if filter is None:
-            return time_entries
-        return [entry for entry in time_entries if self._check_against_filter(filter, entry)]
+            return self.get_all()
+        return list(self.iter_filter(filter=filter))
+
+    def iter_filter(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[TimeEntry]:
+        """Yield the matching entries, each validated only when it is reached
+
+        The stored entries are already in memory, so batch_size has no effect.
+        """
+        entries = self._matching_page(filter) if filter is not None and filter.paged else self._iter_matching(filter)
+        for entry in entries:
+            yield TimeEntry.from_storage(**entry)
+
+    def iter_records(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[EntryRecord]:
+        """Records built straight from the stored entries, which are never turned into TimeEntry objects"""
+        entries = self._matching_page(filter) if filter is not None and filter.paged else self._iter_matching(filter)
+        for entry in entries:
+            yield EntryRecord.from_storage(**entry)
+
+    def _matching_page(self, filter: EntryListFilter) -> list[dict]:
+        """Stored dicts of the requested page, scanning from the end of the window for ``last``
+
+        Only as many entries as the page needs are checked, so recent-history views don't depend on the
+        size of the file.
+        """
+        entries = self._load_data()["entries"]
+        lo, hi = self._date_window(entries, filter.start_date, filter.end_date)
+        if filter.after:
+            if (position := self._id_index().get(filter.after)) is None:
+                raise KeyError("record id not found")
+            lo = max(lo, position + 1)
+        count = filter.last if filter.last is not None else filter.limit
+        wanted = hi if count is None else filter.offset + count
+        positions = range(hi - 1, lo - 1, -1) if filter.last is not None else range(lo, hi)
+        matching = compile_filter(filter, dates=False)
+        found = []
+        for n in positions:
+            if len(found) >= wanted:
+                break
+            if matching(entries[n]):
+                found.append(entries[n])
+        if filter.last is not None:
+            found.reverse()
+        return filter.page(found)
+
+    def _iter_matching(self, filter: EntryListFilter | None) -> Iterator[dict]:
+        """Stored dicts of the entries matching filter"""
+        entries = self._load_data()["entries"]
+        if filter is None:
+            yield from entries[:]  # a copy of the list, so saves made while iterating don't shift it
+            return
+        lo, hi = self._date_window(entries, filter.start_date, filter.end_date)
+        matching = compile_filter(filter, dates=False)
+        for entry in entries[lo:hi]:
+            if matching(entry):
+                yield entry
+
+    def aggregate(
+        self, group_by: Sequence[GroupBy], *, filter: EntryListFilter | None = None, now: datetime | None = None
+    ) -> list[EntryTotal]:
+        """Totals from the daily rollups, with only the running entries read as stored
+
+        Filters selecting by id or paging need the entries themselves: the matching stored entries (or
+        just the requested page of them) are totalled instead, as they are without rollups, without
+        validating them into TimeEntry objects.
+        """
+        totals = Totals(group_by, now)
+        paged = filter is not None and filter.paged
+        if self.rollups and not (paged or (filter and filter.id)):
+            self._load_rollups().add_to(totals, filter)
+            return totals.result()
+        for entry in self._matching_page(filter) if paged else self._iter_matching(filter):
+            end_time = entry.get("end_time")
+            totals.add(
+                datetime.fromisoformat(entry["start_time"]),
+                datetime.fromisoformat(end_time) if end_time else None,
+                entry["project"],
+                entry.get("tags", ()),
+            )
+        return totals.result()
 
     def save(self, entry: TimeEntry) -> None:
-        data = self._load_data()
         entry_dict = entry.model_dump(mode="json")
-        found = False
-        entries = []
-        for e in data["entries"]:
-            if e["id"] == entry.id:
+        with self._locked(exclusive=True):
+            active = self._load_active()
+            data = self._load_data()
+            entries = data["entries"]
+            position = self._id_index().get(entry.id)
+            if position is None:
                 entries.append(entry_dict)
-                found = True
             else:
-                entries.append(e)
-        if not found:
-            entries.append(entry_dict)
-
-        # Sort entries by start_time before saving
-        entries.sort(key=lambda x: x["start_time"])
-        data["entries"] = entries
-        self._save_data(data)
+                self._mark_stale(entries[position])
+                entries[position] = entry_dict
+            self._mark_stale(entry_dict)
+
+            # Sort entries by start_time before saving
+            entries.sort(key=lambda x: x["start_time"])
+            if entry.end_time is None:
+                active = entry_dict
+            elif active and active["id"] == entry.id:
+                active = None
+            self._commit(data, {"op": "save", "entry": entry_dict}, active)
 
     def save_all(self, entries: list[TimeEntry]) -> None:
-        data = self._load_data()
-        data["entries"] = [entry.model_dump(mode="json") for entry in entries]
-        self._save_data(data)
+        entries = sorted((entry.model_dump(mode="json") for entry in entries), key=lambda x: x["start_time"])
+        with self._locked(exclusive=True):
+            data = self._load_data()
+            self._mark_stale(*data["entries"], *entries)
+            data["entries"] = entries
+            self._commit(data, None, next((e for e in entries if not e.get("end_time")), None))
@@ -1,14 +1,56 @@
-import json
-from datetime import datetime
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Self
 
-from peewee import CharField, DateTimeField, Model, SqliteDatabase, fn
+from peewee import (
+    JOIN,
+    SQL,
+    CharField,
+    CompositeKey,
+    DateTimeField,
+    Expression,
+    FloatField,
+    IntegerField,
+    Model,
+    ModelSelect,
+    OperationalError,
+    SqliteDatabase,
+    Tuple,
+    chunked,
+    fn,
+)
 from playhouse.sqlite_ext import JSONField
 
-from ..models import EntryListFilter, TimeEntry
+from ..models import (
+    PROJECT_PREFIX_SEPARATOR,
+    PROJECT_WILDCARDS,
+    EntryListFilter,
+    EntryRecord,
+    EntryTotal,
+    GroupBy,
+    RollupRebuild,
+    TimeEntry,
+)
+from .aggregation import Totals
+from .rollup import DailyRollups
+from .search import fts5_query, parse_query
 from .time_entry_repo import TimeEntryRepository
 
-db = SqliteDatabase(None)
+SAVE_BATCH_SIZE = 150  # rows per INSERT, keeping 6 columns per row under SQLite's 999 bound variables
+
+SCHEMA_VERSION = 4  # stored in PRAGMA user_version
+
+# changing the journal mode (e.g. of a new file to WAL) fails at once, rather than waiting for the busy
+# timeout, while another connection uses the file; opening the connection is retried instead
+CONNECT_ATTEMPTS = 100
+CONNECT_RETRY_DELAY = 0.02  # seconds
+
+# reports reading the rollups while other processes keep writing fall back to totalling the entries
+ROLLUP_READ_ATTEMPTS = 5
 
 
 class TimeEntryORM(Model):
@@ -20,89 +62,481 @@ class TimeEntryORM(Model):
     tags = JSONField()
 
     class Meta:
-        database = db
         table_name = "time_entries"
 
+    @staticmethod
+    def model_from_row(row: tuple) -> TimeEntry:
+        """TimeEntry from a row selected as a tuple of all the columns, in declaration order"""
+        id, start_time, end_time, project, comment, tags = row
+        return TimeEntry.from_storage(
+            id=id, start_time=start_time, end_time=end_time, project=project, comment=comment, tags=tags
+        )
+
+    @staticmethod
+    def record_from_row(row: tuple) -> EntryRecord:
+        id, start_time, end_time, project, comment, tags = row
+        return EntryRecord.from_storage(id, start_time, project, end_time, tags, comment)
+
     def to_model(self) -> TimeEntry:
-        return TimeEntry(
+        return TimeEntry.from_storage(
             id=self.id,
             start_time=self.start_time,
             end_time=self.end_time,
             project=self.project,
             comment=self.comment,
-            tags=set(self.tags),
+            tags=self.tags,
         )
 
+    @staticmethod
+    def row_from_model(entry: TimeEntry) -> dict:
+        return {
+            "id": entry.id,
+            "start_time": entry.start_time,
+            "end_time": entry.end_time,
+            "project": entry.project,
+            "comment": entry.comment,
+            "tags": list(entry.tags),
+        }
+
     @classmethod
     def create_from_model(cls, entry: TimeEntry) -> Self:
-        return cls.create(
-            id=entry.id,
-            start_time=entry.start_time,
-            end_time=entry.end_time,
-            project=entry.project,
-            comment=entry.comment,
-            tags=list(entry.tags),
+        return cls.create(**cls.row_from_model(entry))
+
+    @classmethod
+    def upsert(cls, rows: list[dict]):
+        """INSERT ... ON CONFLICT(id) DO UPDATE query writing rows whether or not their ids exist"""
+        return cls.insert_many(rows).on_conflict(
+            conflict_target=[cls.id],
+            preserve=[cls.start_time, cls.end_time, cls.project, cls.comment, cls.tags],
         )
 
 
-def json_array_contains(json_array, value):
-    return value in json.loads(json_array) if json_array else False
+TimeEntryORM.add_index(TimeEntryORM.index(TimeEntryORM.start_time, name="time_entries_start_time"))
+TimeEntryORM.add_index(TimeEntryORM.index(TimeEntryORM.project, name="time_entries_project"))
+# partial index so finding the running entry never scans the finished ones
+TimeEntryORM.add_index(
+    TimeEntryORM.index(TimeEntryORM.start_time, name="time_entries_active", where=TimeEntryORM.end_time.is_null())
+)
+
+
+class EntryTagORM(Model):
+    """One row per tag of an entry, kept in sync with ``time_entries.tags`` by triggers"""
+
+    tag = CharField()
+    entry_id = CharField()
+
+    class Meta:
+        table_name = "entry_tags"
+        primary_key = CompositeKey("tag", "entry_id")  # doubles as the index for tag lookups
+        without_rowid = True
+
+
+EntryTagORM.add_index(EntryTagORM.index(EntryTagORM.entry_id, name="entry_tags_entry_id"))
+
+TAG_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS time_entries_tags_insert AFTER INSERT ON time_entries BEGIN
+        INSERT OR IGNORE INTO entry_tags (tag, entry_id) SELECT value, new.id FROM json_each(new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_tags_update AFTER UPDATE OF id, tags ON time_entries BEGIN
+        DELETE FROM entry_tags WHERE entry_id = old.id;
+        INSERT OR IGNORE INTO entry_tags (tag, entry_id) SELECT value, new.id FROM json_each(new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_tags_delete AFTER DELETE ON time_entries BEGIN
+        DELETE FROM entry_tags WHERE entry_id = old.id;
+    END""",
+)
+
+# full-text index of the comments; an external content table reading them from time_entries by rowid
+COMMENT_SEARCH_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS time_entries_fts USING fts5(
+        comment, content='time_entries', content_rowid='rowid'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_fts_insert AFTER INSERT ON time_entries BEGIN
+        INSERT INTO time_entries_fts (rowid, comment) VALUES (new.rowid, new.comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_fts_update AFTER UPDATE OF comment ON time_entries BEGIN
+        INSERT INTO time_entries_fts (time_entries_fts, rowid, comment) VALUES ('delete', old.rowid, old.comment);
+        INSERT INTO time_entries_fts (rowid, comment) VALUES (new.rowid, new.comment);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_fts_delete AFTER DELETE ON time_entries BEGIN
+        INSERT INTO time_entries_fts (time_entries_fts, rowid, comment) VALUES ('delete', old.rowid, old.comment);
+    END""",
+    "INSERT INTO time_entries_fts (time_entries_fts) VALUES ('rebuild')",
+)
+
+
+class DailyRollupORM(Model):
+    """Totals of the finished entries per local start day, project and tag set (a sorted JSON array)"""
+
+    day = CharField()
+    project = CharField()
+    tags = JSONField()
+    seconds = FloatField()
+    count = IntegerField()
+
+    class Meta:
+        table_name = "daily_rollups"
+        primary_key = CompositeKey("day", "project", "tags")
+        without_rowid = True
+
+
+class StaleRollupDayORM(Model):
+    """Days whose rollups are recomputed before the next report, marked by triggers on time_entries"""
+
+    day = CharField(primary_key=True)
+
+    class Meta:
+        table_name = "daily_rollups_stale"
+        without_rowid = True
+
+
+# the days are added unless already marked: an upsert on time_entries would override OR IGNORE in a trigger
+ROLLUP_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS time_entries_rollup_insert AFTER INSERT ON time_entries BEGIN
+        INSERT INTO daily_rollups_stale (day) SELECT substr(new.start_time, 1, 10)
+        WHERE substr(new.start_time, 1, 10) NOT IN (SELECT day FROM daily_rollups_stale);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_rollup_update
+    AFTER UPDATE OF start_time, end_time, project, tags ON time_entries BEGIN
+        INSERT INTO daily_rollups_stale (day) SELECT day FROM (
+            SELECT substr(old.start_time, 1, 10) AS day UNION SELECT substr(new.start_time, 1, 10)
+        ) WHERE day NOT IN (SELECT day FROM daily_rollups_stale);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS time_entries_rollup_delete AFTER DELETE ON time_entries BEGIN
+        INSERT INTO daily_rollups_stale (day) SELECT substr(old.start_time, 1, 10)
+        WHERE substr(old.start_time, 1, 10) NOT IN (SELECT day FROM daily_rollups_stale);
+    END""",
+)
+
+MARK_ALL_DAYS_STALE = (
+    "INSERT OR IGNORE INTO daily_rollups_stale (day) SELECT DISTINCT substr(start_time, 1, 10) FROM time_entries"
+)
+
+# recompute the stale days, reading only their range of the start_time index
+REFRESH_ROLLUPS = (
+    "DELETE FROM daily_rollups WHERE day IN (SELECT day FROM daily_rollups_stale)",
+    """INSERT INTO daily_rollups (day, project, tags, seconds, count)
+    SELECT substr(start_time, 1, 10), project,
+        (SELECT json_group_array(value) FROM (SELECT value FROM json_each(time_entries.tags) ORDER BY value)),
+        sum((julianday(end_time) - julianday(start_time)) * 86400), count(*)
+    FROM time_entries
+    WHERE end_time IS NOT NULL
+        AND start_time >= (SELECT min(day) FROM daily_rollups_stale)
+        AND start_time < (SELECT date(max(day), '+1 day') FROM daily_rollups_stale)
+        AND substr(start_time, 1, 10) IN (SELECT day FROM daily_rollups_stale)
+    GROUP BY 1, 2, 3""",
+    "DELETE FROM daily_rollups_stale",
+)
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix (for index-friendly range scans)"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def bind_model(model: type[Model], database: SqliteDatabase) -> type[Model]:
+    """Subclass of model stored in database"""
+    meta = type("Meta", (), {"database": database, "table_name": model._meta.table_name})
+    meta.without_rowid = model._meta.without_rowid  # not inherited by peewee
+    return type(model.__name__, (model,), {"Meta": meta, "__module__": model.__module__})
+
+
+def project_condition(model: type[TimeEntryORM], projects: set[str]) -> Expression | None:
+    """Condition matching the filter projects, wildcard prefixes becoming ranges that use the project index
+
+    None when a bare wildcard matches every project.
+    """
+    condition = model.project.in_(projects)
+    for project in projects:
+        if project[-1] in PROJECT_WILDCARDS:
+            prefix = project[:-1]
+            if not prefix:
+                return None
+            condition |= (model.project >= prefix) & (model.project < prefix_upper_bound(prefix))
+    return condition
+
+
+def migrate(
+    database: SqliteDatabase,
+    model: type[TimeEntryORM],
+    tag_model: type[EntryTagORM],
+    rollup_models: tuple[type[DailyRollupORM], type[StaleRollupDayORM]],
+) -> None:
+    """Bring the database schema up to SCHEMA_VERSION
+
+    Databases created before the schema was versioned report version 0; creating the tables again only
+    adds what they are missing (the indexes). The version is read again under the write lock, taken up
+    front, so processes opening the same database at once wait for each other and migrate it only once.
+    """
+    if database.pragma("user_version") >= SCHEMA_VERSION:
+        return
+    with database.atomic("IMMEDIATE"):
+        version = database.pragma("user_version")
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 1:
+            database.create_tables([model])  # start_time, project and active entry indexes
+        if version < 2:
+            database.create_tables([tag_model])
+            for trigger in TAG_TRIGGERS:
+                database.execute_sql(trigger)
+            database.execute_sql(
+                "INSERT OR IGNORE INTO entry_tags (tag, entry_id) "
+                "SELECT json_each.value, time_entries.id FROM time_entries, json_each(time_entries.tags)"
+            )
+        if version < 3:
+            for statement in COMMENT_SEARCH_SCHEMA:
+                database.execute_sql(statement)
+        if version < 4:
+            database.create_tables(rollup_models)
+            for trigger in ROLLUP_TRIGGERS:
+                database.execute_sql(trigger)
+            database.execute_sql(MARK_ALL_DAYS_STALE)  # computed by the first report
+        database.pragma("user_version", SCHEMA_VERSION)
 
 
 class TimeEntryRepositoryORM(TimeEntryRepository):
-    def __init__(self, db_path: str):
-        db.init(db_path)
-        db.connect()
-        db.create_tables([TimeEntryORM])
-        db.connection().create_function("json_array_contains", 2, json_array_contains)
+    def __init__(self, db_path: str, pragmas: dict | None = None):
+        """pragmas (e.g. ``{"journal_mode": "wal"}``) are applied to the connection when it opens"""
+        self.database = SqliteDatabase(db_path, pragmas=pragmas or {})
+        # models bound to this repository's own database, so several repositories can be open at once
+        self.model = bind_model(TimeEntryORM, self.database)
+        self.tag_model = bind_model(EntryTagORM, self.database)
+        self.rollup_model = bind_model(DailyRollupORM, self.database)
+        self.stale_rollup_model = bind_model(StaleRollupDayORM, self.database)
+        self._connect()
+        migrate(self.database, self.model, self.tag_model, (self.rollup_model, self.stale_rollup_model))
+
+    def _connect(self) -> None:
+        """Open the connection (applying the pragmas), retrying while the journal mode can't be changed"""
+        for attempt in range(CONNECT_ATTEMPTS):
+            try:
+                self.database.connect()
+                return
+            except OperationalError as e:
+                if "locked" not in str(e) or attempt == CONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(CONNECT_RETRY_DELAY)
 
     def get_all(self) -> list[TimeEntry]:
-        return [entry.to_model() for entry in TimeEntryORM.select().order_by(TimeEntryORM.start_time.asc())]
+        return [entry.to_model() for entry in self.model.select().order_by(self.model.start_time.asc())]
 
     def get_by_project(self, project: str) -> list[TimeEntry]:
-        return [entry.to_model() for entry in TimeEntryORM.select().where(TimeEntryORM.project == project)]
+        return [entry.to_model() for entry in self.model.select().where(self.model.project == project)]
 
     def get_entry_by_id(self, id: str) -> TimeEntry:
         try:
-            return TimeEntryORM.get(TimeEntryORM.id == id).to_model()
-        except TimeEntryORM.DoesNotExist as e:
+            return self.model.get(self.model.id == id).to_model()
+        except self.model.DoesNotExist as e:
             raise KeyError("record id not found") from e
 
+    def get_entries_by_partial_id(self, partial_id: str) -> list[TimeEntry]:
+        query = self.model.select().order_by(self.model.start_time.asc())
+        if partial_id:
+            query = query.where((self.model.id >= partial_id) & (self.model.id < prefix_upper_bound(partial_id)))
+        return [entry.to_model() for entry in query]
+
     def delete_entry(self, id: str) -> TimeEntry:
         try:
-            entry = TimeEntryORM.get(TimeEntryORM.id == id)
+            entry = self.model.get(self.model.id == id)
             entry.delete_instance()
             return entry.to_model()
-        except TimeEntryORM.DoesNotExist as e:
+        except self.model.DoesNotExist as e:
             raise KeyError("record id not found") from e
 
-    def get_active_entry(self):
-        return TimeEntryORM.get(TimeEntryORM.end_time.is_null()).to_model()
+    def get_active_entry(self) -> TimeEntry | None:
+        entry = self.model.select().where(self.model.end_time.is_null()).order_by(self.model.start_time.asc()).first()
+        return entry.to_model() if entry else None
 
-    def filter(self, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
-        query = TimeEntryORM.select().order_by(TimeEntryORM.start_time.asc())
+    def _filter_query(self, filter: EntryListFilter | None) -> ModelSelect:
+        query = self.model.select().order_by(self.model.start_time.asc(), self.model.id.asc())
         if filter:
             if filter.id:
-                query = query.where(TimeEntryORM.id.startswith(filter.id))
-            if filter.projects:
-                query = query.where(TimeEntryORM.project.in_(filter.projects))
+                query = query.where(self.model.id.startswith(filter.id))
+            if filter.projects and (condition := project_condition(self.model, filter.projects)) is not None:
+                query = query.where(condition)
             if filter.start_date:
-                query = query.where(TimeEntryORM.start_time >= filter.start_date)
+                query = query.where(self.model.start_time >= filter.start_date)
             if filter.end_date:
-                query = query.where(TimeEntryORM.start_time <= datetime.combine(filter.end_date, datetime.max.time()))
-            if filter.tags:
-                for tag in filter.tags:
-                    query = query.where(fn.json_array_contains(TimeEntryORM.tags, tag))
-        return [entry.to_model() for entry in query]
+                query = query.where(self.model.start_time <= datetime.combine(filter.end_date, datetime.max.time()))
+            if filter.tags:  # entries with any of the tags
+                tagged = self.tag_model.select(self.tag_model.entry_id).where(self.tag_model.tag.in_(filter.tags))
+                query = query.where(self.model.id.in_(tagged))
+        return query
+
+    def filter(self, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        if filter is None or not filter.paged:
+            return [entry.to_model() for entry in self._filter_query(filter)]
+        return [TimeEntryORM.model_from_row(row) for row in self._paged_rows(filter)]
+
+    def _paged_rows(self, filter: EntryListFilter) -> list[tuple]:
+        query = self._filter_query(filter)
+        if filter.after:
+            if (after := self.model.get_or_none(self.model.id == filter.after)) is None:
+                raise KeyError("record id not found")
+            query = query.where(Tuple(self.model.start_time, self.model.id) > (after.start_time, after.id))
+        if filter.last is not None:
+            # newest first through the start_time index, then back into ascending order
+            query = query.order_by(self.model.start_time.desc(), self.model.id.desc()).limit(filter.last)
+            return list(reversed(query.offset(filter.offset).tuples()))
+        return list(query.limit(filter.limit).offset(filter.offset).tuples())
+
+    def iter_filter(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[TimeEntry]:
+        """Yield the matching entries a page of batch_size rows at a time
+
+        Each page is a separate query continuing after the last (start_time, id) seen, so no read
+        transaction stays open while the caller works and rows are read as plain tuples.
+        """
+        return map(TimeEntryORM.model_from_row, self._iter_rows(filter, batch_size))
+
+    def iter_records(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[EntryRecord]:
+        return map(TimeEntryORM.record_from_row, self._iter_rows(filter, batch_size))
+
+    def _iter_rows(self, filter: EntryListFilter | None, batch_size: int) -> Iterator[tuple]:
+        if filter is not None and filter.paged:
+            yield from self._paged_rows(filter)
+            return
+        query = self._filter_query(filter).limit(batch_size)
+        page = list(query.tuples())
+        while page:
+            yield from page
+            if len(page) < batch_size:
+                return
+            last_start_time, last_id = page[-1][1], page[-1][0]
+            after = Tuple(self.model.start_time, self.model.id) > (last_start_time, last_id)
+            page = list(query.where(after).tuples())
+
+    def search(self, query: str, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        """Entries whose comment matches every word of query, answered by the FTS5 index"""
+        terms = parse_query(query)
+        if not terms:
+            return []
+        matching = SQL("(SELECT rowid FROM time_entries_fts WHERE time_entries_fts MATCH ?)", [fts5_query(terms)])
+        return [
+            entry.to_model() for entry in self._filter_query(filter).where(Expression(SQL("rowid"), "IN", matching))
+        ]
+
+    def aggregate(
+        self, group_by: Sequence[GroupBy], *, filter: EntryListFilter | None = None, now: datetime | None = None
+    ) -> list[EntryTotal]:
+        """Totals from the daily rollups, with only the running entries read from time_entries
+
+        Filters selecting by id total the matching entries with GROUP BY instead, and paging filters the
+        rows of the requested page.
+        """
+        if filter is not None and filter.paged:
+            totals = Totals(group_by, now)
+            for record in map(TimeEntryORM.record_from_row, self._paged_rows(filter)):
+                totals.add(record.start_time, record.end_time, record.project, record.tags)
+            return totals.result()
+        if filter is not None and filter.id:
+            return self._aggregate_entries(group_by, filter, now)
+        totals = Totals(group_by, now)
+        for _ in range(ROLLUP_READ_ATTEMPTS):
+            self._refresh_rollups()
+            with self.database.atomic():
+                # rollups and running entries from one snapshot, taken once every day was up to date
+                if self.stale_rollup_model.select().exists():
+                    continue  # another process wrote entries after the refresh
+                self._load_rollups(filter).add_to(totals, filter)
+                for total in self._aggregate_entries(group_by, filter, totals.now, running=True):
+                    totals.add_total(total)
+                return totals.result()
+        return self._aggregate_entries(group_by, filter, totals.now)
+
+    def _aggregate_entries(
+        self,
+        group_by: Sequence[GroupBy],
+        filter: EntryListFilter | None,
+        now: datetime | None,
+        *,
+        running: bool = False,
+    ) -> list[EntryTotal]:
+        """Totals computed by SQLite with GROUP BY, durations from julianday differences"""
+        now = now or datetime.now().astimezone()
+        start_time, project = self.model.start_time, self.model.project
+        local_date = fn.substr(start_time, 1, 10).coerce(False)  # stored times keep their local offset
+        columns = {
+            "day": local_date,
+            "week": fn.date(local_date, "weekday 0", "-6 days").coerce(False),  # the Monday starting the week
+            "month": fn.substr(start_time, 1, 7).coerce(False),
+            "project": project,
+            # everything before the first separator (appended, so a project without one is its own prefix)
+            "project-prefix": fn.substr(
+                project, 1, fn.instr(project.concat(PROJECT_PREFIX_SEPARATOR), PROJECT_PREFIX_SEPARATOR) - 1
+            ),
+            "tag": fn.coalesce(self.tag_model.tag, "").coerce(False),
+        }
+        keys = [columns[group] for group in group_by]
+        end_time = fn.coalesce(self.model.end_time, str(now))
+        seconds = fn.sum((fn.julianday(end_time) - fn.julianday(start_time)) * 86400).coerce(False)
+        query = self._filter_query(filter).select(*keys, seconds, fn.count(self.model.id)).group_by(*keys)
+        query = query.order_by(*keys)
+        if running:
+            query = query.where(self.model.end_time.is_null())
+        if "tag" in group_by:
+            query = query.join(
+                self.tag_model, JOIN.LEFT_OUTER, on=(self.tag_model.entry_id == self.model.id), src=self.model
+            )
+        return [
+            EntryTotal(tuple(key), timedelta(seconds=round(seconds, 3)), count)
+            for *key, seconds, count in query.tuples()
+            if count  # without group keys, no matching entries still give a row of (NULL, 0)
+        ]
+
+    def _refresh_rollups(self) -> None:
+        """Recompute the days marked stale
+
+        The write lock is taken up front: upgrading a read transaction to a write fails at once, without
+        waiting for the busy timeout, while another process writes.
+        """
+        if self.stale_rollup_model.select().exists():
+            with self.database.atomic("IMMEDIATE"):
+                for statement in REFRESH_ROLLUPS:
+                    self.database.execute_sql(statement)
+
+    def _load_rollups(self, filter: EntryListFilter | None) -> DailyRollups:
+        """Rollups of the days and projects within filter, as last refreshed"""
+        rollup = self.rollup_model
+        query = rollup.select(rollup.day, rollup.project, rollup.tags, rollup.seconds, rollup.count)
+        if filter:
+            if filter.start_date:
+                query = query.where(rollup.day >= filter.start_date.isoformat())
+            if filter.end_date:
+                query = query.where(rollup.day <= filter.end_date.isoformat())
+            if filter.projects and (condition := project_condition(rollup, filter.projects)) is not None:
+                query = query.where(condition)
+        return DailyRollups.from_rows(
+            (day, project, tags, timedelta(seconds=round(seconds, 3)), count)
+            for day, project, tags, seconds, count in query.tuples()
+        )
+
+    def rebuild_rollups(self) -> RollupRebuild:
+        with self.database.atomic("IMMEDIATE"):
+            self._refresh_rollups()
+            kept = self._load_rollups(None)
+            self.rollup_model.delete().execute()
+            self.database.execute_sql(MARK_ALL_DAYS_STALE)
+            self._refresh_rollups()
+            rollups = self._load_rollups(None)
+        return RollupRebuild(len(rollups.days), rollups.outdated_days(kept))
 
     def save(self, entry: TimeEntry) -> None:
-        try:
-            orm_entry = TimeEntryORM.get(TimeEntryORM.id == entry.id)
-        except TimeEntryORM.DoesNotExist:
-            orm_entry = TimeEntryORM.create_from_model(entry)
-        orm_entry.save()
-
-    def save_all(self, entries: list[TimeEntry]) -> None:
-        with db.atomic():
-            data = [entry.model_dump(mode="json") for entry in entries]
-            TimeEntryORM.insert_many(data).execute()
+        self.model.upsert([TimeEntryORM.row_from_model(entry)]).execute()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.database.atomic():
+            yield
+
+    def save_all(self, entries: Iterable[TimeEntry]) -> None:
+        """Insert or update the entries in batches inside one transaction; any iterable is consumed lazily"""
+        with self.database.atomic():
+            for batch in chunked(map(TimeEntryORM.row_from_model, entries), SAVE_BATCH_SIZE):
+                self.model.upsert(batch).execute()
+
+    def backup(self, filename: str | Path) -> int:
+        """Copy the whole database to filename with SQLite's online backup API, returning the entry count"""
+        with closing(sqlite3.connect(filename)) as target:
+            self.database.connection().backup(target)
+        return self.model.select().count()
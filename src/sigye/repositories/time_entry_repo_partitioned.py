@@ -0,0 +1,356 @@
+import json
+import os
+from collections.abc import Iterator, Sequence
+from contextlib import ExitStack, contextmanager, suppress
+from datetime import datetime
+from pathlib import Path
+
+from ..models import EntryListFilter, EntryRecord, EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from ..utils.file_utils import atomic_open, file_lock
+from .aggregation import Totals
+from .time_entry_repo import TimeEntryRepository
+from .time_entry_repo_file import FormatFactory, TimeEntryRepositoryFile
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def shard_key(entry: TimeEntry) -> str:
+    """Month (YYYY-MM) of the entry's local start date, which names the shard that owns it"""
+    return f"{entry.start_time:%Y-%m}"
+
+
+class TimeEntryRepositoryPartitioned(TimeEntryRepository):
+    """File storage split into one file per month
+
+    ``time_entries.toml`` is stored as a ``time_entries/`` directory holding ``2026-10.toml`` style
+    shards (in the format given by the filename's extension) and a small ``manifest.json`` that points
+    at the active entry. Reads only open the shards overlapping the requested dates and writes only
+    touch the shard that owns the entry. Every write runs as a transaction holding an exclusive lock on
+    ``manifest.json.lock`` (taken before any shard lock), so concurrent processes can't overwrite each
+    other's active pointer.
+
+    An existing single-file store at ``filename`` (e.g. ``time_entries.toml``) is split into shards the
+    first time the repository is opened, and the original file is kept as ``time_entries.migrated.toml``.
+
+    An entry whose start time is moved into another month is relocated when it was read through the
+    repository first (as ``TimeTrackingService.update_entry`` does); otherwise the id is treated as new.
+    """
+
+    def __init__(self, filename: str | Path = "timesheet.yaml", fsync: bool = False):
+        self.filename = Path(filename)
+        self.fsync = fsync
+        self.directory = self.filename.with_suffix("")
+        self.suffix = FormatFactory.get_format_from_filename(self.filename).suffix
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._shards: dict[str, TimeEntryRepositoryFile] = {}
+        self._locations: dict[str, str] = {}  # entry id -> shard key, for entries read by this repository
+        self._manifest = None
+        self._manifest_signature = None  # manifest file signature self._manifest was read at
+        self._manifest_dirty = False
+        self._transactions: list[ExitStack] = []  # one per level of the open (nested) transactions
+        self._enrolled: list[set[str]] = []  # shards taking part in each level
+        if self.filename.exists() and not self.manifest_filename.exists() and not self._shard_keys():
+            self._migrate_single_file()
+
+    @property
+    def manifest_filename(self) -> Path:
+        return self.directory / MANIFEST_FILENAME
+
+    @property
+    def manifest_lock_filename(self) -> Path:
+        return self.directory / f"{MANIFEST_FILENAME}.lock"
+
+    def _current_manifest_signature(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.manifest_filename)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_manifest(self) -> dict:
+        self._manifest_signature = self._current_manifest_signature()
+        try:
+            with open(self.manifest_filename) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None}
+
+    def _load_manifest(self) -> dict:
+        # inside a transaction the manifest was read under the exclusive lock and nobody else can write it
+        if not self._transactions and (
+            self._manifest is None or self._current_manifest_signature() != self._manifest_signature
+        ):
+            with file_lock(self.manifest_lock_filename):
+                self._manifest = self._read_manifest()
+        return self._manifest
+
+    def _save_manifest(self, manifest: dict):
+        """Update the manifest; it is written when the enclosing transaction completes"""
+        self._manifest = manifest
+        self._manifest_dirty = True
+
+    def _write_manifest(self):
+        with atomic_open(self.manifest_filename, fsync=self.fsync) as f:
+            json.dump(self._manifest, f)
+        self._manifest_signature = self._current_manifest_signature()
+        self._manifest_dirty = False
+
+    def _shard_keys(self) -> list[str]:
+        """Keys of the shards on disk, oldest first"""
+        return sorted(p.name.removesuffix(self.suffix) for p in self.directory.glob(f"????-??{self.suffix}"))
+
+    def _migrate_single_file(self):
+        """Split the entries of a single-file store into shards and set the original file aside"""
+        with self.transaction():
+            if self.manifest_filename.exists() or self._shard_keys():
+                return  # another process migrated it first
+            self.save_all(TimeEntryRepositoryFile(self.filename, parse_cache=False).get_all())
+        self.filename.rename(self.filename.with_suffix(f".migrated{self.suffix}"))
+        for sidecar in ("cache", "active", "rollup"):
+            with suppress(FileNotFoundError):
+                os.unlink(f"{self.filename}.{sidecar}")
+
+    def _shard(self, key: str) -> TimeEntryRepositoryFile:
+        if key not in self._shards:
+            self._shards[key] = TimeEntryRepositoryFile(self.directory / f"{key}{self.suffix}", fsync=self.fsync)
+        if self._transactions and key not in self._enrolled[-1]:
+            # outermost level first, so the shard's own transactions nest the same way
+            for stack, enrolled in zip(self._transactions, self._enrolled, strict=True):
+                if key not in enrolled:
+                    stack.enter_context(self._shards[key].transaction())
+                    enrolled.add(key)
+        return self._shards[key]
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Batch writes in every shard touched, each shard being written once on exit
+
+        The manifest lock is held for the whole transaction and the manifest is written while the
+        shards still hold their locks. A nested transaction that raises is rolled back to where it
+        started, in the manifest and in every shard it touched.
+        """
+        outermost = not self._transactions
+        savepoint = (self._manifest, self._manifest_dirty, dict(self._locations))
+        try:
+            with ExitStack() as stack:
+                if outermost:
+                    stack.enter_context(file_lock(self.manifest_lock_filename, exclusive=True))
+                    self._manifest = self._read_manifest()
+                self._transactions.append(stack)
+                self._enrolled.append(set())
+                try:
+                    yield
+                    if outermost and self._manifest_dirty:
+                        self._write_manifest()
+                finally:
+                    self._transactions.pop()
+                    self._enrolled.pop()
+        except BaseException:
+            if outermost:
+                self._manifest = None
+                self._manifest_dirty = False
+                self._locations = {}
+            else:
+                self._manifest, self._manifest_dirty, self._locations = savepoint
+            raise
+
+    def _read(self, key: str, entries: list[TimeEntry]) -> list[TimeEntry]:
+        for entry in entries:
+            self._locations[entry.id] = key
+        return entries
+
+    def _update_active(self, entry: TimeEntry, key: str):
+        manifest = self._load_manifest()
+        active = manifest["active"]
+        if entry.end_time is None:
+            if active != {"id": entry.id, "shard": key}:
+                self._save_manifest({**manifest, "active": {"id": entry.id, "shard": key}})
+        elif active and active["id"] == entry.id:
+            self._save_manifest({**manifest, "active": None})
+
+    def get_active_entry(self) -> TimeEntry | None:
+        active = self._load_manifest()["active"]
+        if not active:
+            return None
+        if active["shard"] in self._shard_keys():
+            try:
+                entry = self._shard(active["shard"]).get_entry_by_id(active["id"])
+            except KeyError:
+                pass
+            else:
+                if entry.end_time is None:
+                    return self._read(active["shard"], [entry])[0]
+        return self._repair_active()
+
+    def _repair_active(self) -> TimeEntry | None:
+        """Find the active entry by scanning the shards (newest first) when the manifest is stale"""
+        with self.transaction():
+            active = None
+            for key in reversed(self._shard_keys()):
+                if entry := self._shard(key).get_active_entry():
+                    active = self._read(key, [entry])[0]
+                    break
+            pointer = {"id": active.id, "shard": key} if active else None
+            self._save_manifest({**self._load_manifest(), "active": pointer})
+        return active
+
+    def get_all(self) -> list[TimeEntry]:
+        return [entry for key in self._shard_keys() for entry in self._read(key, self._shard(key).get_all())]
+
+    def get_by_project(self, project: str) -> list[TimeEntry]:
+        return [
+            entry for key in self._shard_keys() for entry in self._read(key, self._shard(key).get_by_project(project))
+        ]
+
+    def _locate(self, id: str) -> str:
+        """Find the key of the shard holding an entry, newest shards first"""
+        if id in self._locations:
+            return self._locations[id]
+        for key in reversed(self._shard_keys()):
+            try:
+                self._read(key, [self._shard(key).get_entry_by_id(id)])
+            except KeyError:
+                continue
+            return key
+        raise KeyError("record id not found")
+
+    def get_entry_by_id(self, id: str) -> TimeEntry:
+        return self._shard(self._locate(id)).get_entry_by_id(id)
+
+    def get_entries_by_partial_id(self, partial_id: str) -> list[TimeEntry]:
+        return [
+            entry
+            for key in self._shard_keys()
+            for entry in self._read(key, self._shard(key).get_entries_by_partial_id(partial_id))
+        ]
+
+    def delete_entry(self, id: str) -> TimeEntry:
+        with self.transaction():
+            key = self._locate(id)
+            entry = self._shard(key).delete_entry(id)
+            del self._locations[id]
+            manifest = self._load_manifest()
+            if manifest["active"] and manifest["active"]["id"] == id:
+                self._save_manifest({**manifest, "active": None})
+        return entry
+
+    def _overlapping_shard_keys(self, filter: EntryListFilter | None) -> list[str]:
+        """Keys of the shards that can hold entries within the filter's dates, oldest first"""
+        if filter is None:
+            return self._shard_keys()
+        first = filter.start_date.isoformat()[:7] if filter.start_date else ""
+        last = filter.end_date.isoformat()[:7] if filter.end_date else "9999-99"
+        return [key for key in self._shard_keys() if first <= key <= last]
+
+    def filter(self, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        if filter is None:
+            return self.get_all()
+        if filter.paged:
+            return self._filter_page(filter)
+        return [
+            entry
+            for key in self._overlapping_shard_keys(filter)
+            for entry in self._read(key, self._shard(key).filter(filter=filter))
+        ]
+
+    def _filter_page(self, filter: EntryListFilter) -> list[TimeEntry]:
+        """Collect the page shard by shard (newest first for ``last``), stopping once it is full"""
+        keys = self._overlapping_shard_keys(filter)
+        after_key = None
+        if filter.after:
+            after_key = self._locate(filter.after)
+            keys = [key for key in keys if key >= after_key]
+        newest_first = filter.last is not None
+        if newest_first:
+            keys.reverse()
+        count = filter.last if newest_first else filter.limit
+        wanted = None if count is None else filter.offset + count
+        found: list[TimeEntry] = []
+        for key in keys:
+            remaining = None if wanted is None else wanted - len(found)
+            shard_filter = filter.model_copy(
+                update={
+                    "after": filter.after if key == after_key else "",
+                    "offset": 0,
+                    "limit": None if newest_first else remaining,
+                    "last": remaining if newest_first else None,
+                }
+            )
+            entries = self._read(key, self._shard(key).filter(filter=shard_filter))
+            found = entries + found if newest_first else found + entries
+            if wanted is not None and len(found) >= wanted:
+                break
+        return filter.page(found)
+
+    def search(self, query: str, *, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        return [
+            entry
+            for key in self._overlapping_shard_keys(filter)
+            for entry in self._read(key, self._shard(key).search(query, filter=filter))
+        ]
+
+    def aggregate(
+        self, group_by: Sequence[GroupBy], *, filter: EntryListFilter | None = None, now: datetime | None = None
+    ) -> list[EntryTotal]:
+        """Totals of each overlapping shard added up; a page can span shards, so it is totalled entry by entry"""
+        if filter is not None and filter.paged:
+            return super().aggregate(group_by, filter=filter, now=now)
+        totals = Totals(group_by, now)
+        for key in self._overlapping_shard_keys(filter):
+            for total in self._shard(key).aggregate(group_by, filter=filter, now=totals.now):
+                totals.add_total(total)
+        return totals.result()
+
+    def rebuild_rollups(self) -> RollupRebuild:
+        """Rebuild the rollups of every shard"""
+        days, outdated = 0, []
+        for key in self._shard_keys():
+            rebuilt = self._shard(key).rebuild_rollups()
+            days += rebuilt.days
+            outdated += rebuilt.outdated
+        return RollupRebuild(days, outdated)
+
+    def iter_filter(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[TimeEntry]:
+        """Yield the matching entries one shard after another"""
+        if filter is not None and filter.paged:
+            yield from self.filter(filter=filter)
+            return
+        for key in self._overlapping_shard_keys(filter):
+            for entry in self._shard(key).iter_filter(filter=filter, batch_size=batch_size):
+                self._locations[entry.id] = key
+                yield entry
+
+    def iter_records(self, *, filter: EntryListFilter | None = None, batch_size: int = 1000) -> Iterator[EntryRecord]:
+        """Yield the matching records one shard after another"""
+        if filter is not None and filter.paged:
+            yield from map(EntryRecord.from_entry, self.filter(filter=filter))
+            return
+        for key in self._overlapping_shard_keys(filter):
+            for record in self._shard(key).iter_records(filter=filter, batch_size=batch_size):
+                self._locations[record.id] = key
+                yield record
+
+    def save(self, entry: TimeEntry) -> None:
+        key = shard_key(entry)
+        with self.transaction():
+            previous = self._locations.get(entry.id)
+            if previous is not None and previous != key:
+                self._shard(previous).delete_entry(entry.id)
+            self._shard(key).save(entry)
+            self._locations[entry.id] = key
+            self._update_active(entry, key)
+
+    def save_all(self, entries: list[TimeEntry]) -> None:
+        shards: dict[str, list[TimeEntry]] = {}
+        for entry in entries:
+            shards.setdefault(shard_key(entry), []).append(entry)
+        with self.transaction():
+            for key in self._shard_keys():
+                if key not in shards:
+                    self._shard(key).save_all([])
+            self._locations = {}
+            for key, shard_entries in shards.items():
+                self._shard(key).save_all(shard_entries)
+                self._read(key, shard_entries)
+            active = next(({"id": e.id, "shard": shard_key(e)} for e in entries if e.end_time is None), None)
+            self._save_manifest({**self._load_manifest(), "active": active})
@@ -1,10 +1,16 @@
+from collections.abc import Iterator, Sequence
 from datetime import datetime
 
 from .config.settings import Settings
 from .editors import Editor
 from .editors.shell_editor import ShellEditor
-from .models import EntryListFilter, TimeEntry
-from .repositories import TimeEntryRepository, TimeEntryRepositoryFile, TimeEntryRepositoryORM
+from .models import EntryListFilter, EntryRecord, EntryTotal, GroupBy, RollupRebuild, TimeEntry
+from .repositories import (
+    TimeEntryRepository,
+    TimeEntryRepositoryFile,
+    TimeEntryRepositoryORM,
+    TimeEntryRepositoryPartitioned,
+)
 from .utils.datetime_utils import adjust_stop_time
 
 
@@ -16,13 +22,17 @@ class TimeTrackingService:
         editor: Editor | None = None,
     ):
         self.settings = settings
-        self.repository = repository or (
-            TimeEntryRepositoryORM(settings.data_filename)
-            if settings.data_filename.suffix == ".db"
-            else TimeEntryRepositoryFile(settings.data_filename)
-        )
+        self.repository = repository or self._create_repository(settings)
         self.editor = editor or ShellEditor(settings.editor, settings.editor_format)
 
+    @staticmethod
+    def _create_repository(settings: Settings) -> TimeEntryRepository:
+        if settings.data_filename.suffix == ".db":
+            return TimeEntryRepositoryORM(settings.data_filename, pragmas=settings.sqlite.pragmas())
+        if settings.storage_layout == "monthly":
+            return TimeEntryRepositoryPartitioned(settings.data_filename, fsync=settings.fsync_writes)
+        return TimeEntryRepositoryFile(settings.data_filename, fsync=settings.fsync_writes)
+
     def start_tracking(
         self,
         project: str,
@@ -32,27 +42,30 @@ class TimeTrackingService:
     ) -> TimeEntry:
         """Start tracking time for a project"""
         start_time = start_time or datetime.now().astimezone()
-        if active_entry := self.repository.get_active_entry():
-            active_entry.stop(end_time=start_time)  # Stop any active entry first
-            self.repository.save(active_entry)
-
-        # Apply auto-tagging rules
-        final_tags = (tags or set()) | self.settings.apply_auto_tags(project)
-
-        # Create and save new entry
-        new_entry = TimeEntry(
-            project=project,
-            start_time=start_time,
-            comment=comment,
-            tags=final_tags,
-        )
-        self.repository.save(new_entry)
+        with self.repository.transaction():  # stop the active entry and save the new one in one write
+            if active_entry := self.repository.get_active_entry():
+                active_entry.stop(end_time=start_time)  # Stop any active entry first
+                self.repository.save(active_entry)
+
+            # Apply auto-tagging rules
+            final_tags = (tags or set()) | self.settings.apply_auto_tags(project)
+
+            # Create and save new entry
+            new_entry = TimeEntry(
+                project=project,
+                start_time=start_time,
+                comment=comment,
+                tags=final_tags,
+            )
+            self.repository.save(new_entry)
         return new_entry
 
-    def stop_tracking(self, stop_time: datetime | None = None) -> TimeEntry | None:
-        """Stop the active time entry"""
+    def stop_tracking(self, stop_time: datetime | None = None, comment: str = "") -> TimeEntry | None:
+        """Stop the active time entry, replacing its comment when one is given"""
         active_entry = self.repository.get_active_entry()
         if active_entry:
+            if comment:
+                active_entry.comment = comment
             if stop_time is not None:
                 stop_time = adjust_stop_time(active_entry.start_time, stop_time)
             active_entry.stop(stop_time)
@@ -65,25 +78,56 @@ class TimeTrackingService:
         return self.repository.get_active_entry()
 
     def list_entries(self, filter: EntryListFilter | None = None) -> list[TimeEntry]:
-        """List time entries based on filter"""
+        """List time entries based on filter
+
+        A paged filter without a time period or dates (e.g. just ``last=20``) pages through all entries.
+        ``filter.after`` may be a partial id.
+        """
         if filter:
-            # Handle default behavior: show today's entries plus any active entry from a previous date
-            if filter.time_period == "" and not filter.start_date and not filter.end_date:
-                active_entry = self.repository.get_active_entry()
-                today = datetime.now().date()
-
-                # If there's an active entry from a previous date, include that date
-                if active_entry and active_entry.start_time.date() < today:
-                    filter.start_date = active_entry.start_time.date()
-                    filter.end_date = today
-                else:
-                    # Otherwise, just show today
-                    filter.start_date = today
-                    filter.end_date = today
-
-            return self.repository.filter(filter=filter)
+            return self.repository.filter(filter=self._list_filter(filter))
         return self.repository.get_all()
 
+    def list_records(self, filter: EntryListFilter | None = None) -> list[EntryRecord]:
+        """The entries list_entries gives, as compact read-only records for output"""
+        return list(self.repository.iter_records(filter=self._list_filter(filter) if filter else None))
+
+    def _list_filter(self, filter: EntryListFilter) -> EntryListFilter:
+        """filter with a full ``after`` id and, without a time period or dates, the default dates"""
+        if filter.after:
+            filter.after = self.get_entry_by_partial_id(filter.after).id
+        # Handle default behavior: show today's entries plus any active entry from a previous date
+        if filter.time_period == "" and not filter.start_date and not filter.end_date and not filter.paged:
+            active_entry = self.repository.get_active_entry()
+            today = datetime.now().date()
+
+            # If there's an active entry from a previous date, include that date
+            if active_entry and active_entry.start_time.date() < today:
+                filter.start_date = active_entry.start_time.date()
+                filter.end_date = today
+            else:
+                # Otherwise, just show today
+                filter.start_date = today
+                filter.end_date = today
+        return filter
+
+    def search_entries(self, query: str, filter: EntryListFilter | None = None) -> list[TimeEntry]:
+        """Entries matching filter whose comment contains every word of query"""
+        return self.repository.search(query, filter=filter)
+
+    def report(
+        self, group_by: Sequence[GroupBy], filter: EntryListFilter | None = None, now: datetime | None = None
+    ) -> list[EntryTotal]:
+        """Total time and number of entries per group key (e.g. per week and project), ordered by key
+
+        The repository answers from its daily rollups, reading only the active entry as stored and never
+        loading TimeEntry objects. The active entry counts up to now (the current time by default).
+        """
+        return self.repository.aggregate(group_by, filter=filter, now=now)
+
+    def rebuild_rollups(self) -> RollupRebuild:
+        """Recompute the daily rollups reports read from the entries, listing the days that were out of date"""
+        return self.repository.rebuild_rollups()
+
     def get_entry(self, id: str) -> TimeEntry:
         """Get an entry by id"""
         return self.repository.get_entry_by_id(id)
@@ -106,7 +150,7 @@ class TimeTrackingService:
 
     def get_entry_by_partial_id(self, partial_id: str) -> TimeEntry:
         """Get an entry by a partial id"""
-        entries = self.list_entries(EntryListFilter(id=partial_id))
+        entries = self.repository.get_entries_by_partial_id(partial_id)
         if len(entries) == 1:
             return entries[0]
         elif len(entries) > 1:
@@ -115,9 +159,21 @@ class TimeTrackingService:
 
     def export_entries(self, filename: str) -> int:
         """Export entries to a file"""
-        entries = self.list_entries()
+        if filename.suffix == ".db" and isinstance(self.repository, TimeEntryRepositoryORM):
+            return self.repository.backup(filename)  # copies the database pages, no entry is loaded
         output_repository = (
-            TimeEntryRepositoryFile(filename) if filename.suffix != ".db" else TimeEntryRepositoryORM(filename)
+            TimeEntryRepositoryFile(filename, sidecars=False)
+            if filename.suffix != ".db"
+            else TimeEntryRepositoryORM(filename, pragmas=self.settings.sqlite.pragmas())
         )
-        output_repository.save_all(entries)
-        return len(entries)
+        exported = 0
+
+        def entries() -> Iterator[EntryRecord]:
+            # records are read and written like entries, without a TimeEntry per stored entry
+            nonlocal exported
+            for record in self.repository.iter_records():
+                exported += 1
+                yield record
+
+        output_repository.save_all(entries())
+        return exported
@@ -116,6 +116,14 @@ def test_stop_command(tmp_path):
         assert result.exit_code != 0
         assert "Invalid time format" in result.output
 
+        runner.invoke(["-f", "test4.yaml", "start", "test-project"])
+        result = runner.invoke(["-f", "test4.yaml", "-o", "text", "stop", "finished it"])
+        assert result.exit_code == 0
+        assert "finished it" in result.output
+        result = runner.invoke(["-f", "test4.yaml", "-o", "text", "stop", "again"])
+        assert result.exit_code == 0
+        assert "No active time record." in result.output
+
 
 def test_status_command(tmp_path):
     """Test the status command"""
@@ -166,6 +174,14 @@ def test_list_command_and_aliases(tmp_path):
         assert "project1" in result.output
         assert "project2" not in result.output
 
+        result = runner.invoke(["-f", "test.yaml", "list", "--last", "1"])
+        assert result.exit_code == 0
+        assert "project1" not in result.output
+        assert "project2" in result.output
+
+        result = runner.invoke(["-f", "test.yaml", "list", "--after", "nothing"])
+        assert result.exit_code == 1
+
 
 def test_edit_command(tmp_path):
     """Test the edit command"""
@@ -232,3 +248,55 @@ def test_config_file_option(tmp_path):
         result = runner.invoke(["-c", str(config_file), "start", "test-project"])
         assert result.exit_code == 0
         assert "test-project" in result.output
+
+
+def test_search_command(tmp_path):
+    runner = CliRunner()
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        for filename in ("test.yaml", "test.db"):
+            runner.invoke(["-f", filename, "start", "project1", "Fixed TICKET-123 in the parser", "--tag", "tag1"])
+            runner.invoke(["-f", filename, "start", "project2", "reviewed the ticket queue"])
+            runner.invoke(["-f", filename, "stop"])
+
+            result = runner.invoke(["-f", filename, "-o", "text", "search", "ticket"])
+            assert result.exit_code == 0
+            assert "project1" in result.output
+            assert "project2" in result.output
+
+            result = runner.invoke(["-f", filename, "-o", "text", "search", "pars* ticket", "today"])
+            assert "project1" in result.output
+            assert "project2" not in result.output
+
+            result = runner.invoke(["-f", filename, "-o", "text", "search", "ticket", "--tag", "tag1"])
+            assert "project1" in result.output
+            assert "project2" not in result.output
+
+
+def test_report_command(tmp_path):
+    runner = CliRunner()
+    with runner.isolated_filesystem(temp_dir=tmp_path):
+        for filename in ("test.yaml", "test.db"):
+            runner.invoke(["-f", filename, "start", "abc-1", "--tag", "tag1"])
+            runner.invoke(["-f", filename, "start", "abc-2"])
+
+            result = runner.invoke(["-f", filename, "-o", "text", "report"])
+            assert result.exit_code == 0
+            assert "abc-1" in result.output
+            assert "abc-2" in result.output
+
+            result = runner.invoke(["-f", filename, "-o", "csv", "report", "today", "--by", "project-prefix"])
+            assert result.output.splitlines()[0] == "project-prefix,duration,seconds,count"
+            assert result.output.splitlines()[1].startswith("abc,")
+            assert result.output.splitlines()[1].endswith(",2")
+
+            for output_format in ("json", "yaml", "rich", "markdown"):
+                result = runner.invoke(["-f", filename, "-o", output_format, "report", "--by", "day", "--by", "tag"])
+                assert result.exit_code == 0
+                assert "tag1" in result.output
+
+            result = runner.invoke(["-f", filename, "report", "--by", "year"])
+            assert result.exit_code != 0
+
+            result = runner.invoke(["-f", filename, "-o", "json", "rebuild-rollups"])
+            assert result.exit_code == 0
+            assert '"outdated": []' in result.output
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 
 import pytest
 
-from ..models import EntryListFilter, TimeEntry
+from ..models import EntryListFilter, EntryRecord, TimeEntry
 
 
 def test_time_entry():
@@ -92,3 +92,53 @@ def test_bad_stop_time():
     t1 = TimeEntry(start_time=now + timedelta(hours=-4), project="test-project", comment="hello")
     with pytest.raises(ValueError):
         t1.stop(now + timedelta(hours=-5))
+
+
+def test_time_entry_from_storage():
+    entry = TimeEntry(
+        start_time="2021-01-01T09:00:00-05:00", end_time="2021-01-01T15:00:00Z", project="test", tags=["tag1"]
+    )
+    stored = entry.model_dump(mode="json")
+    assert TimeEntry.from_storage(**stored) == entry
+    assert TimeEntry.from_storage(**entry.model_dump()) == entry  # already parsed values pass through
+    del stored["end_time"]  # as TOML leaves out empty values
+    assert TimeEntry.from_storage(**stored) == entry.model_copy(update={"end_time": None})
+    assert TimeEntry.from_storage(**stored, note="x") == TimeEntry(**stored, note="x")  # unknown keys are dropped
+    # trusted loads skip validation, which still applies to everything else
+    assert TimeEntry.from_storage(id="x", start_time="2021-01-02T00:00", end_time="2021-01-01", project="p")
+    with pytest.raises(ValueError):
+        TimeEntry(start_time="2021-01-02T00:00", end_time="2021-01-01", project="p")
+
+
+@pytest.mark.parametrize(
+    "start_time, end_time",
+    [
+        ("2021-01-01T09:00:00.123456-05:00", "2021-01-01T10:30:00-05:00"),
+        ("2021-01-01T09:00:00+00:00", None),
+        ("2021-01-01T09:00:00", "2021-01-01T09:00:00.000001"),  # naive times stay naive
+    ],
+)
+def test_entry_record(start_time, end_time):
+    entry = TimeEntry(start_time=start_time, end_time=end_time, project="test", tags={"tag1"}, comment="hi")
+    record = EntryRecord.from_entry(entry)
+
+    assert record.to_entry() == entry
+    assert EntryRecord.from_storage(**entry.model_dump(mode="json")) == record
+    assert EntryRecord.from_storage(**entry.model_dump(mode="json"), note="x") == record
+    assert record.model_dump(mode="json") == entry.model_dump(mode="json")
+    assert record.start_time.isoformat() == entry.start_time.isoformat()
+    assert record.naive_start_time == entry.naive_start_time
+    assert record.naive_end_time == entry.naive_end_time
+    if end_time:
+        assert record.duration == entry.duration
+        assert record.humanized_duration == entry.humanized_duration
+    with pytest.raises(AttributeError):
+        record.project = "other"
+
+
+def test_entry_record_shares_values():
+    first = EntryRecord.from_storage("1", "2021-01-01T09:00:00-05:00", "".join(["pro", "ject"]), tags=["a", "b"])
+    second = EntryRecord.from_storage("2", "2021-06-01T09:00:00-05:00", "".join(["proj", "ect"]), tags=["b", "a"])
+    assert first.project is second.project
+    assert first.tags is second.tags
+    assert first.tz is second.tz
@@ -1,13 +1,14 @@
 from datetime import datetime, timedelta
 from pathlib import Path
+from unittest import mock
 
 import pytest
 
 from ..config.settings import AutoTagRule, Settings
 from ..editors import Editor
 from ..editors.shell_editor import ShellEditor
-from ..models import EntryListFilter
-from ..repositories import TimeEntryRepositoryFile
+from ..models import EntryListFilter, EntryRecord, EntryTotal
+from ..repositories import TimeEntryRepositoryFile, TimeEntryRepositoryORM, TimeEntryRepositoryPartitioned
 from ..services import TimeTrackingService
 
 
@@ -39,6 +40,31 @@ def test_initialization(tmp_path):
     assert isinstance(tts.editor, DummyEditorService)
 
 
+def test_monthly_storage_layout(tmp_path):
+    settings = create_test_settings(tmp_path)
+    settings.storage_layout = "monthly"
+    tts = TimeTrackingService(settings=settings)
+    assert isinstance(tts.repository, TimeEntryRepositoryPartitioned)
+    a = tts.start_tracking("test-project")
+    b = tts.start_tracking("test-project-2")
+    assert tts.get_active_entry() == b
+    assert tts.get_entry(a.id).end_time == b.start_time
+    assert (tmp_path / "test" / f"{a.start_time:%Y-%m}.yaml").exists()
+
+
+def test_sqlite_pragmas(tmp_path):
+    settings = create_test_settings(tmp_path)
+    settings.data_filename = tmp_path / "test.db"
+    settings.sqlite.synchronous = "full"
+    tts = TimeTrackingService(settings=settings)
+    assert isinstance(tts.repository, TimeEntryRepositoryORM)
+    tts.start_tracking("test-project")
+    database = tts.repository.database
+    assert database.pragma("journal_mode") == "wal"
+    assert database.pragma("synchronous") == 2  # full
+    assert database.pragma("temp_store") == 2  # memory
+
+
 def test_basic_time_tracking(tmp_path):
     filename = tmp_path / "test.yaml"
     settings = create_test_settings(tmp_path)
@@ -113,6 +139,21 @@ def test_start_stop(tmp_path):
     assert d1.end_time is not None
 
 
+def test_start_writes_once(tmp_path):
+    settings = create_test_settings(tmp_path)
+    repository = TimeEntryRepositoryFile(tmp_path / "test.yaml")
+    tts = TimeTrackingService(repository=repository, settings=settings)
+    tts.start_tracking("test-project")
+
+    with mock.patch.object(repository, "_save_data", wraps=repository._save_data) as save_data:
+        tts.start_tracking("test-project-2")
+        stopped = tts.stop_tracking(comment="done")
+    assert save_data.call_count == 2
+    assert stopped.comment == "done"
+    assert tts.get_entry(stopped.id).comment == "done"
+    assert len(tts.list_entries()) == 2
+
+
 def test_stop_tracking_infers_prior_day_for_stale_active_entry(tmp_path):
     """Stopping an entry left running from a prior day with a bare time-of-day
     should land on the entry's start date, not today."""
@@ -202,6 +243,28 @@ def test_filtered_list(tmp_path):
     assert all(e.start_time.date() == now.date() for e in l7)
 
 
+@pytest.mark.parametrize("filename", ["test.yaml", "test.db"])
+def test_report(tmp_path, filename):
+    settings = create_test_settings(tmp_path)
+    settings.data_filename = tmp_path / filename
+    tts = TimeTrackingService(settings=settings)
+    start = datetime.fromisoformat("2021-01-04T09:00:00+00:00")
+    tts.start_tracking("abc-1", start_time=start)
+    tts.start_tracking("abc-2", start_time=start + timedelta(hours=1))
+    tts.start_tracking("def", start_time=start + timedelta(days=7), tags={"tag1"})  # still running
+    now = start + timedelta(days=7, minutes=30)
+
+    assert tts.report(["project-prefix"], now=now) == [
+        EntryTotal(("abc",), timedelta(days=7), 2),
+        EntryTotal(("def",), timedelta(minutes=30), 1),
+    ]
+    assert tts.report(["week", "tag"], filter=EntryListFilter(start_date="2021-01-11"), now=now) == [
+        EntryTotal(("2021-01-11", "tag1"), timedelta(minutes=30), 1),
+    ]
+    assert tts.report([], filter=EntryListFilter(projects={"abc+"}), now=now) == [EntryTotal((), timedelta(days=7), 2)]
+    assert tts.rebuild_rollups() == (1, [])  # only the day whose entries have all ended
+
+
 def test_invalid_entry_fetch(tmp_path):
     filename = tmp_path / "test.yaml"
     settings = create_test_settings(tmp_path)
@@ -287,9 +350,11 @@ def test_export(tmp_path):
     tts.stop_tracking()
     assert all(entry is not None for entry in [d1, d2, d3])
 
-    # Export entries
-    entry_count = tts.export_entries(export_filename)
+    # Export entries, streamed as records rather than TimeEntry objects
+    with mock.patch.object(tts.repository, "iter_filter", side_effect=AssertionError("entries loaded")):
+        entry_count = tts.export_entries(export_filename)
     assert entry_count == 3
+    assert sorted(p.name for p in tmp_path.glob("export*")) == ["export.toml"]
 
     # Verify exported file
     tts = TimeTrackingService(repository=TimeEntryRepositoryFile(export_filename), settings=settings)
@@ -302,6 +367,11 @@ def test_export(tmp_path):
     entry_count = tts.export_entries(export_filename)
     assert entry_count == 3
 
+    # from one sqlite database to another
+    tts = TimeTrackingService(repository=TimeEntryRepositoryORM(export_filename), settings=settings)
+    assert tts.export_entries(tmp_path / "copy.db") == 3
+    assert TimeEntryRepositoryORM(tmp_path / "copy.db").get_all() == tts.list_entries()
+
 
 def test_default_list_with_active_entry_from_previous_date(tmp_path):
     """Test that default list shows today's entries plus active entry from previous date"""
@@ -349,6 +419,9 @@ def test_default_list_with_active_entry_from_previous_date(tmp_path):
     assert today_entry1.id in entry_ids
     assert today_entry2.id in entry_ids
     assert two_days_entry.id not in entry_ids
+    # the records the list command prints are of the same entries
+    assert tts.list_records(filter=EntryListFilter(time_period="")) == [EntryRecord.from_entry(e) for e in entries]
+    assert tts.list_records(filter=EntryListFilter(last=1)) == [EntryRecord.from_entry(today_entry2)]
 
     # Test "all" time period - should show everything
     all_filter = EntryListFilter(time_period="all")
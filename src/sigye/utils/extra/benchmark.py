@@ -0,0 +1,51 @@
+"""Time the queries behind `sigye list week` and `sigye status` on SQLite stores of growing size
+
+Run with ``python -m sigye.utils.extra.benchmark [SIZE ...]``. With the start_time index and the partial
+index on running entries both queries should take about the same time at every size.
+"""
+
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+from ...models import EntryListFilter, TimeEntry
+from ...repositories import TimeEntryRepositoryORM
+from .generator import iter_fake_entries
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+ENTRIES_PER_DAY = 8
+
+
+def best_time(func: Callable, repeat: int = 5) -> float:
+    """Best wall-clock time of several calls, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def load_repository(filename: Path, size: int) -> TimeEntryRepositoryORM:
+    repo = TimeEntryRepositoryORM(str(filename))
+    repo.save_all(iter_fake_entries(size, per_day=ENTRIES_PER_DAY))  # streamed in batches
+    # the running entry `status` looks for
+    repo.save(TimeEntry(project="Project A", start_time=datetime.now().astimezone()))
+    return repo
+
+
+def run(sizes: list[int]) -> None:
+    print(f"{'entries':>10} {'list week':>12} {'status':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            repo = load_repository(Path(directory) / f"benchmark_{size}.db", size)
+            week = best_time(lambda repo=repo: repo.filter(filter=EntryListFilter(time_period="week")))
+            status = best_time(repo.get_active_entry)
+            print(f"{size:>10,} {week * 1000:>10.2f}ms {status * 1000:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    run([int(size) for size in sys.argv[1:]] or list(DEFAULT_SIZES))
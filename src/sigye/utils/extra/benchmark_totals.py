@@ -0,0 +1,54 @@
+"""Time per-day, per-week and per-project totals: the per-entry loop against columnar batches
+
+Run with ``python -m sigye.utils.extra.benchmark_totals [SIZE ...]``. The loop adds up TimeEntry
+durations as ``Totals`` does; the batch columns are built once and then grouped with NumPy (when it is
+installed) and with the pure-Python fallback.
+"""
+
+import sys
+from datetime import datetime
+
+from ...models import EntryRecord
+from ...repositories.aggregation import Totals
+from ...repositories.batch import EntryBatch, np
+from .benchmark import best_time
+from .generator import iter_fake_entries
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+ENTRIES_PER_DAY = 8
+GROUPINGS = (("day",), ("week",), ("project",))
+
+
+def loop_totals(entries, now: datetime) -> None:
+    for group_by in GROUPINGS:
+        totals = Totals(group_by, now)
+        for entry in entries:
+            totals.add(entry.start_time, entry.end_time, entry.project, entry.tags)
+        totals.result()
+
+
+def batch_totals(batch: EntryBatch, now: datetime) -> None:
+    for group_by in GROUPINGS:
+        batch.totals(group_by, now)
+
+
+def run(sizes: list[int]) -> None:
+    now = datetime.now().astimezone()
+    print(f"{'entries':>10} {'loop':>12} {'build':>12} {'numpy':>12} {'python':>12}")
+    for size in sizes:
+        entries = list(iter_fake_entries(size, per_day=ENTRIES_PER_DAY))
+        records = [EntryRecord.from_entry(entry) for entry in entries]
+        loop = best_time(lambda entries=entries: loop_totals(entries, now), repeat=3)
+        build = best_time(lambda records=records: EntryBatch(records), repeat=3)
+        if np is not None:
+            batch = EntryBatch(records)
+            vectorized = f"{best_time(lambda batch=batch: batch_totals(batch, now)) * 1000:>10.2f}ms"
+        else:
+            vectorized = f"{'-':>12}"
+        batch = EntryBatch(records, vectorized=False)
+        python = best_time(lambda batch=batch: batch_totals(batch, now), repeat=3)
+        print(f"{size:>10,} {loop * 1000:>10.2f}ms {build * 1000:>10.2f}ms {vectorized} {python * 1000:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    run([int(size) for size in sys.argv[1:]] or list(DEFAULT_SIZES))
@@ -1,27 +1,30 @@
 import random
+from collections.abc import Iterator
 from datetime import datetime, timedelta
 
 from ...models import TimeEntry
 from ...repositories import TimeEntryRepositoryFile, TimeEntryRepositoryORM
 
 
-def generate_fake_entries(count: int) -> list[TimeEntry]:
-    """Generate fake time entries for testing"""
-    entries = []
+def iter_fake_entries(count: int, per_day: int = 1) -> Iterator[TimeEntry]:
+    """Generate fake time entries for testing, per_day of them on each day going back from today"""
+    now = datetime.now().astimezone()
     for i in range(count):
-        start_time = datetime.now().astimezone() - timedelta(days=i)
+        start_time = now - timedelta(days=i // per_day)
         start_time = start_time.replace(hour=random.randint(7, 12))
         end_time = start_time + timedelta(hours=random.randint(1, 4))
-        entries.append(
-            TimeEntry(
-                project=f"Project {random.choice(['A', 'B', 'C'])}",
-                start_time=start_time,
-                end_time=end_time,
-                comment=f"Comment {i}",
-                tags=set(random.choices(["tag1", "tag2", "tag3"], k=random.randint(0, 3))),
-            )
+        yield TimeEntry(
+            project=f"Project {random.choice(['A', 'B', 'C'])}",
+            start_time=start_time,
+            end_time=end_time,
+            comment=f"Comment {i}",
+            tags=set(random.choices(["tag1", "tag2", "tag3"], k=random.randint(0, 3))),
         )
-    return entries
+
+
+def generate_fake_entries(count: int, per_day: int = 1) -> list[TimeEntry]:
+    """Generate fake time entries for testing"""
+    return list(iter_fake_entries(count, per_day))
 
 
 def save_fake_entries(filename: str, count: int):
@@ -0,0 +1,58 @@
+import os
+import stat
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from typing import IO
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - advisory locks are only available on POSIX
+    fcntl = None
+
+
+@contextmanager
+def atomic_open(filename: str | os.PathLike, mode: str = "w", fsync: bool = False) -> Iterator[IO]:
+    """Open a temporary file that atomically replaces filename once the block completes
+
+    Readers see either the old or the new contents, never a partially written file. With fsync the
+    data (and the rename) are flushed to disk before returning.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filename)}.", suffix=".tmp")
+    try:
+        with suppress(FileNotFoundError):
+            os.chmod(tmp_filename, stat.S_IMODE(os.stat(filename).st_mode))
+        with os.fdopen(fd, mode) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_filename)
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+@contextmanager
+def file_lock(filename: str | os.PathLike, exclusive: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on filename: shared for readers, exclusive for writers
+
+    Where ``fcntl`` is unavailable (Windows) this does not lock at all.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(filename, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from ..file_utils import atomic_open
+
+
+def test_atomic_open_replaces_file(tmp_path):
+    filename = tmp_path / "data.txt"
+    filename.write_text("old")
+    os.chmod(filename, 0o644)
+    with atomic_open(filename, fsync=True) as f:
+        f.write("new")
+        assert filename.read_text() == "old"  # readers see the old contents until the block completes
+    assert filename.read_text() == "new"
+    assert os.stat(filename).st_mode & 0o777 == 0o644
+    assert os.listdir(tmp_path) == ["data.txt"]
+
+
+def test_atomic_open_keeps_file_on_error(tmp_path):
+    filename = tmp_path / "data.txt"
+    filename.write_text("old")
+    with pytest.raises(RuntimeError), atomic_open(filename) as f:
+        f.write("partial")
+        raise RuntimeError("abort")
+    assert filename.read_text() == "old"
+    assert os.listdir(tmp_path) == ["data.txt"]